@@ -36,9 +36,12 @@ import time
 import m5
 import m5.ticks
 from m5.objects import *
+from m5.util import addToPath
 
 import argparse
 
+addToPath('..')
+
 from system import *
 
 
@@ -51,7 +54,8 @@ def parse_arguments():
     parser.add_argument("cpu_type", type = str, help = "Name of the detailed CPU")
     parser.add_argument("num_cpus", type = str, help = "Number of CPUs")
     parser.add_argument("mem_type", type = str,
-                        help = "HBM or DDR4")
+                        help = "Memory backend, e.g. HBM, HBMSALP or DDR4, "
+                        "see memsys/backends.py. HBM is HBM_1x64")
     parser.add_argument("channels", type = int,
                         help = "Number of memory channels")
     parser.add_argument("benchmark", type = str,
@@ -60,6 +64,11 @@ def parse_arguments():
                         help = "1 for synthetic graph, 0 for real graph")
     parser.add_argument("graph", type = str,
                         help = "synthetic=1: integer number. synthetic=0: graph")
+    parser.add_argument("--ff-cpu", type = str, default = "auto",
+                        choices = ["auto", "kvm", "atomic"],
+                        help = "CPU that boots and fast-forwards to the ROI. "
+                        "auto uses KVM if /dev/kvm is available and the "
+                        "atomic CPU otherwise")
 
     return parser.parse_args()
 
@@ -94,7 +103,8 @@ if __name__ == "__m5_main__":
     benchmark_size = args.graph
     synthetic = args.synthetic
     # Only supports MOESI_hammer protocol
-    system = MyRubySystem(kernel, disk, 'MOESI_hammer', num_cpus, num_chnls, mem_type)
+    system = MyRubySystem(kernel, disk, 'MOESI_hammer', num_cpus, num_chnls, mem_type,
+                          args.ff_cpu)
 
     # For workitems to work correctly
     # This will cause the simulator to exit simulation when the first work
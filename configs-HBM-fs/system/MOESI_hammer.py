@@ -51,7 +51,7 @@ class MOESIHammerCache(RubySystem):
         super(MOESIHammerCache, self).__init__()
 
 
-    def setup(self, system, cpus, mem_ctrls, dma_ports, iobus):
+    def setup(self, system, cpus, mem_channels, dma_ports, iobus):
         """Set up the Ruby cache subsystem. Note: This can't be done in the
            constructor because many of these items require a pointer to the
            ruby system (self). This causes infinite recursion in initialize()
@@ -66,9 +66,12 @@ class MOESIHammerCache(RubySystem):
 
 
 
+        # One directory per channel, mem_channels holds the controllers of
+        # each and the port the channel takes requests on
+        num_ctrls = sum(len(ctrls) for ctrls, port in mem_channels)
         pf_size = MemorySize('1 MB')
-        pf_size.value = pf_size.value * 2 * self._numL2Caches / len(mem_ctrls)
-        dir_bits = int(math.log(len(mem_ctrls), 2))
+        pf_size.value = pf_size.value * 2 * self._numL2Caches / num_ctrls
+        dir_bits = int(math.ceil(math.log(len(mem_channels), 2)))
         pf_bits = int(math.log(pf_size.value, 2))
         block_size_bits = int(math.log(system.cache_line_size, 2))
         if dir_bits > 0:
@@ -90,7 +93,8 @@ class MOESIHammerCache(RubySystem):
         # The number of L2 caches are dependent to the architecture.
         self.controllers = \
             [L1Cache(system, self, cpu, self._numL2Caches) for cpu in cpus] + \
-            [DirController(self, system.mem_ranges, mem_ctrls[j], pf_size, pf_start_bit) for j in range(len(mem_ctrls))] + \
+            [DirController(self, system.mem_ranges, ctrls, port, pf_size,
+                           pf_start_bit) for ctrls, port in mem_channels] + \
             [DMAController(self) for i in range(len(dma_ports))]
 
         # Create one sequencer per CPU and dma controller.
@@ -120,7 +124,8 @@ class MOESIHammerCache(RubySystem):
 
         # Create the network and connect the controllers.
         # NOTE: This is quite different if using Garnet!
-        self.network.connectControllers(self.controllers, len(cpus), len(mem_ctrls))
+        self.network.connectControllers(self.controllers, len(cpus),
+                                        len(mem_channels))
         self.network.vcs_per_vnet = 4
         self.network.ni_flit_size = 128
         self.network.routing_algorithm = 0
@@ -240,7 +245,7 @@ class DirController(Directory_Controller):
         cls._version += 1 # Use count for this particular type
         return cls._version - 1
 
-    def __init__(self, ruby_system, ranges, mem_ctrl, pf_size, pf_start_bit):
+    def __init__(self, ruby_system, ranges, mem_ctrls, port, pf_size, pf_start_bit):
         """ranges are the memory ranges assigned to this controller.
         """
         # if len(mem_ctrls) > 1:
@@ -249,10 +254,10 @@ class DirController(Directory_Controller):
         self.ProbeFilter = RubyCache(size = pf_size, assoc = 4,
                          start_index_bit = pf_start_bit)
         self.version = self.versionCount()
-        self.addr_ranges = mem_ctrl.dram.range
+        self.addr_ranges = [ctrl.dram.range for ctrl in mem_ctrls]
         self.ruby_system = ruby_system
         self.directory = RubyDirectoryMemory()
-        self.memory = mem_ctrl.port
+        self.memory = port
         pf = self.ProbeFilter
         self.connectQueues(ruby_system, pf)
     def connectQueues(self, ruby_system, pf):
@@ -27,7 +27,10 @@
 #
 # Authors: Jason Lowe-Power
 
-from m5.objects import IdeDisk, CowDiskImage, RawDiskImage
+import m5
+from m5.objects import *
+
+import os
 
 class CowDisk(IdeDisk):
 
@@ -37,3 +40,27 @@ class CowDisk(IdeDisk):
         self.image = CowDiskImage(child=RawDiskImage(read_only=True),
                                   read_only=False)
         self.image.child.image_file = filename
+
+class NonCachingAtomicCPU(AtomicSimpleCPU):
+    """
+    Fast-forward CPU for hosts without KVM. Like the KVM CPU it runs the
+    memory system in atomic_noncaching mode, so it bypasses the caches until
+    the run switches to the timing or detailed CPUs.
+    """
+    @classmethod
+    def memory_mode(cls):
+        return 'atomic_noncaching'
+
+def fastForwardCpu(ff_cpu = 'auto'):
+    """
+    'kvm' or 'atomic'. 'auto' picks KVM when this gem5 is built with it and
+    the host exposes /dev/kvm.
+    """
+    if ff_cpu == 'auto':
+        if 'X86KvmCPU' in globals() and \
+                os.access('/dev/kvm', os.R_OK | os.W_OK):
+            return 'kvm'
+        return 'atomic'
+    if ff_cpu not in ('kvm', 'atomic'):
+        m5.fatal("Unknown fast-forward CPU {}".format(ff_cpu))
+    return ff_cpu
@@ -31,12 +31,20 @@ import m5
 from m5.objects import *
 from m5.util import convert
 from .fs_tools import *
+from memsys.backends import channelGroups, connectScheds, getBackend
 import math
+
+# Names this system used before the shared backends, HBM is the 64-bit
+# pseudo channel part
+_MEM_TYPES = {'HBM': 'HBM_1x64'}
+
 class MyRubySystem(System):
 
-    def __init__(self, kernel, disk, mem_sys, num_cpus, num_chnls, mem_type):
+    def __init__(self, kernel, disk, mem_sys, num_cpus, num_chnls, mem_type,
+                 ff_cpu = 'auto'):
         super(MyRubySystem, self).__init__()
-        self._mem_type = mem_type
+        self._ff_cpu = fastForwardCpu(ff_cpu)
+        self._backend = getBackend(_MEM_TYPES.get(mem_type, mem_type))
         # self._host_parallel = cpu_type == "kvm"
         self._num_channels = num_chnls
         self._bpc = 64
@@ -74,10 +82,13 @@ class MyRubySystem(System):
         from .MOESI_hammer import MOESIHammerCache
         self.caches = MOESIHammerCache()
 
-        self.caches.setup(self, self.cpu, self.mem_ctrls,
+        self.caches.setup(self, self.cpu, self._mem_channels,
                           [self.pc.south_bridge.ide.dma,
                            self.iobus.mem_side_ports],
                           self.iobus)
+    def getFastForwardCpu(self):
+        return self._ff_cpu
+
     def totalInsts(self):
         return sum([cpu.totalInsts() for cpu in self.cpu])
     
@@ -92,11 +103,16 @@ class MyRubySystem(System):
             c.createThreads()
 
     def createCPU(self, num_cpus):
-        self.cpu = [X86KvmCPU(cpu_id = i) for i in range(num_cpus)]
+        if self._ff_cpu == 'kvm':
+            self.cpu = [X86KvmCPU(cpu_id = i) for i in range(num_cpus)]
+        else:
+            self.cpu = [NonCachingAtomicCPU(cpu_id = i)
+                        for i in range(num_cpus)]
         self.createCPUThreads(self.cpu)
         self.setupInterrupts()
-        self.createEventQueues(self.cpu)
-        self.kvm_vm = KvmVM()
+        if self._ff_cpu == 'kvm':
+            self.createEventQueues(self.cpu)
+            self.kvm_vm = KvmVM()
         self.mem_mode = 'atomic_noncaching'
 
         self.timingCpu = [TimingSimpleCPU(cpu_id = i, switched_out = True)
@@ -145,32 +161,17 @@ class MyRubySystem(System):
         self._createMemoryControllers(self._num_channels, DDR3_1600_8x8)
 
     def _createMemoryControllers(self, num, cls):
-
-        mem_ctrls = []
-        num_int = num 
-        addr_range = self.mem_ranges[0]
-        intlv_low_bit = 6
-        intlv_bits = int(math.log(num_int, 2))
-
-        for i in range(num_int):
-            if self._mem_type == 'HBM':
-                interface = HBM_1000_4H_1x64()
-            elif self._mem_type == 'HBMSALP':
-                interface = HBM_1000_4H_1x64()
-                interface.subarray_per_bank = 8
-                interface.tWA = '3ns'
-                interface.salp_enable = True
-            elif self._mem_type == 'DDR4':
-                interface = DDR4_2400_8x8()
-            interface.range = AddrRange(addr_range.start, size = addr_range.size(),
-                        intlvHighBit = intlv_low_bit + intlv_bits - 1,
-                        xorHighBit = 0,
-                        intlvBits = intlv_bits,
-                        intlvMatch = i)
-            ctrl = MemCtrl()
-            ctrl.dram = interface
-            mem_ctrls.append(ctrl)
-        self.mem_ctrls = mem_ctrls
+        backend = self._backend
+        self.mem_ctrls = backend.createCtrls(self.mem_ranges[0], num,
+                                             self._bpc, intlv_size = 64)
+        scheds = backend.createScheds(num, read_buffer_size = 1,
+                                      write_buffer_size = 1,
+                                      resp_buffer_size = 0)
+        if scheds:
+            self.mem_scheds = scheds
+            connectScheds(self.mem_scheds, self.mem_ctrls, 'contiguous')
+        self._mem_channels = channelGroups(self.mem_ctrls, scheds,
+                                           'contiguous')
 
     def initFS(self, cpus):
         self.pc = Pc()
@@ -36,10 +36,25 @@ import time
 import m5
 import m5.ticks
 from m5.objects import *
+from m5.util import addToPath
+from m5.util.convert import toLatency
+import _m5.stats
 
 import argparse
+import hashlib
+import json
+import os
+import shutil
+
+addToPath('..')
 
 from system import *
+from harness.sampling import summarize
+from harness.startup import StartupTimer
+from harness.stats import SectionLog, StatsTail, memCtrlMetrics
+from memsys.backends import BANK_MAPPINGS
+
+startup = StartupTimer()
 
 
 def parse_arguments():
@@ -60,29 +75,302 @@ def parse_arguments():
                         help = "1 for synthetic graph, 0 for real graph")
     parser.add_argument("graph", type = str,
                         help = "synthetic=1: integer number. synthetic=0: graph")
+    parser.add_argument("--jobs", type = str, default = None,
+                        help = "More benchmark:graph[:synthetic] jobs, "
+                        "comma separated, to run after the first one in the "
+                        "same boot, e.g. cc:20,pr:21:1. Each job's ROI is "
+                        "dumped as its own stats section")
+    parser.add_argument("--trials", type = int, default = 1,
+                        help = "GAPBS trials (-n) per job. Each trial's ROI "
+                        "is dumped as its own stats section and the first "
+                        "one is labelled as warm-up")
+    parser.add_argument("--mem-type", type = str, default = None,
+                        help = "Memory backend of memsys/backends.py, e.g. "
+                        "LLM, HBM or DDR4. Defaults to LLM for classic and "
+                        "LLM_SA for Ruby")
+    parser.add_argument("--bank-mapping", type = str, default = None,
+                        choices = BANK_MAPPINGS,
+                        help = "Banks to schedulers: strided, contiguous or "
+                        "hashed. Defaults to strided for classic and "
+                        "contiguous for Ruby")
+    parser.add_argument("--banks-per-channel", type = int, default = 64,
+                        help = "Number of LLM banks per channel (classic)")
+    parser.add_argument("--intlv-size", type = int, default = None,
+                        help = "Bytes mapped to one bank before moving to "
+                        "the next, 64 by default")
+    parser.add_argument("--xor-low-bit", type = int, default = None,
+                        help = "Lowest address bit XORed into the bank "
+                        "select bits, 0 for no hashing. Defaults to 20 "
+                        "(classic) and 0 (Ruby)")
+    parser.add_argument("--mem-size", type = str, default = None,
+                        help = "Size of the data memory (classic), defaults "
+                        "to 512MB per channel. Fix it to share boot "
+                        "checkpoints across channel counts")
+    parser.add_argument("--ff-cpu", type = str, default = "auto",
+                        choices = ["auto", "kvm", "atomic"],
+                        help = "CPU that boots and fast-forwards to the ROI. "
+                        "auto uses KVM if /dev/kvm is available and the "
+                        "atomic CPU otherwise")
+    parser.add_argument("--host-parallel", type = str, default = "auto",
+                        choices = ["auto", "on", "off"],
+                        help = "Run every KVM vCPU in its own event queue "
+                        "and host thread during boot and fast-forward "
+                        "(classic). auto does so for more than one CPU")
+    parser.add_argument("--sim-quantum", type = str, default = "auto",
+                        help = "Synchronization quantum of the event "
+                        "queues, e.g. 1ms. auto is 1ms, longer when there "
+                        "are more vCPUs than host cores")
+    parser.add_argument("--profile-startup", action = "store_true",
+                        help = "Profile config building and instantiate, "
+                        "reporting each startup phase and the slowest "
+                        "functions in startup.json")
+    parser.add_argument("--no-config-dump", action = "store_true",
+                        help = "Do not write config.ini and config.json")
+    parser.add_argument("--checkpoint-dir", type = str, default = None,
+                        help = "Boot once per kernel, disk and number of "
+                        "CPUs: restore the post-boot checkpoint from this "
+                        "directory, or take it if it does not exist yet")
+    parser.add_argument("--roi-checkpoint", action = "store_true",
+                        help = "Also keep a checkpoint at the start of the "
+                        "ROI per benchmark, graph and number of CPUs in "
+                        "--checkpoint-dir and restore it straight into the "
+                        "detailed CPU, skipping boot and graph generation")
+    parser.add_argument("--stats-interval", type = str, default = None,
+                        help = "Also dump the stats every interval during "
+                        "the ROI, e.g. 100us, into timeseries.h5 (or "
+                        "timeseries.txt without HDF5 support). stats.txt "
+                        "keeps one section per ROI")
+    parser.add_argument("--sample", action = "store_true",
+                        help = "Simulate the ROI in samples instead of "
+                        "entirely in detail and extrapolate the memory "
+                        "bandwidth and latency into sampling.json")
+    parser.add_argument("--sample-ff", type = str, default = "10ms",
+                        help = "Fast-forward between two samples")
+    parser.add_argument("--sample-warmup", type = str, default = "100us",
+                        help = "Functional warm-up before each sample")
+    parser.add_argument("--sample-window", type = str, default = "50us",
+                        help = "Detailed measurement window of a sample")
+    parser.add_argument("--max-samples", type = int, default = None,
+                        help = "Stop after this many samples instead of at "
+                        "the end of the ROI")
 
     return parser.parse_args()
 
 
-def writeBenchScript(dir, benchmark_name, size, synthetic):
+def benchCommand(benchmark_name, size, synthetic, trials = 1):
+    if (synthetic):
+        return './{} -g {} -n {}\n'.format(benchmark_name, size, trials)
+    return './{} -sf {} -n {}\n'.format(benchmark_name, size, trials)
+
+def writeBenchScript(dir, benchmark_name, size, synthetic, trials = 1):
     """
     This method creates a script in dir which will be eventually
     passed to the simulated system (to run a specific benchmark
     at bootup).
     """
     input_file_name = '{}/run_{}_{}'.format(dir, benchmark_name, size)
-    if (synthetic):
-        with open(input_file_name,"w") as f:
-           f.write('./{} -g {} -n 1\n'.format(benchmark_name, size))
-    elif(synthetic==0):
-        with open(input_file_name,"w") as f:
-           f.write('./{} -sf {} -n 1\n'.format(benchmark_name, size))
+    with open(input_file_name,"w") as f:
+        f.write(benchCommand(benchmark_name, size, synthetic, trials))
 
     return input_file_name
 
+def parseJobs(text, synthetic):
+    """[(benchmark, graph, synthetic)] from 'bfs:20,cc:21:1,...'."""
+    jobs = []
+    for spec in text.split(','):
+        fields = spec.split(':')
+        if len(fields) not in (2, 3):
+            m5.fatal("Bad job {}, expected benchmark:graph[:synthetic]"
+                     .format(spec))
+        jobs.append((fields[0], fields[1],
+                     int(fields[2]) if len(fields) == 3 else synthetic))
+    return jobs
+
+def writeBatchScript(dir, jobs, trials = 1):
+    """
+    Runs every job back to back in one boot. The GAPBS binaries bracket
+    their ROI with m5 workbegin/workend themselves, which separates the
+    jobs for the host. The final m5 exit ends the run even if a job never
+    reaches its ROI.
+    """
+    input_file_name = '{}/run_batch'.format(dir)
+    with open(input_file_name,"w") as f:
+        for benchmark_name, size, synthetic in jobs:
+            f.write(benchCommand(benchmark_name, size, synthetic, trials))
+        f.write('m5 exit\n')
+    return input_file_name
+
+def jobLabel(benchmark_name, size, synthetic):
+    graph = 'g{}'.format(size) if synthetic else os.path.basename(size)
+    return '{}_{}'.format(benchmark_name, graph)
+
+def writeBootScript(dir):
+    """
+    Script passed to the simulated system when booting for a checkpoint.
+    The guest exits to the host right after boot, where the checkpoint is
+    taken, and then reads and runs the actual benchmark script. Restored
+    runs resume right before that second readfile.
+    """
+    input_file_name = '{}/run_boot'.format(dir)
+    with open(input_file_name,"w") as f:
+        f.write('m5 exit\n')
+        f.write('m5 readfile > /tmp/gapbs_job\n')
+        f.write('sh /tmp/gapbs_job\n')
+    return input_file_name
+
+def checkpointDir(root_dir, name, system):
+    """
+    The memory ranges are part of every checkpoint name since a checkpoint
+    can only be restored into the same physical memory layout.
+    """
+    layout = ','.join(str(rng) for rng in system.mem_ranges)
+    return os.path.join(root_dir, '{}_{}'.format(name,
+                        hashlib.sha1(layout.encode()).hexdigest()[:8]))
+
+def bootCheckpointDir(root_dir, kernel, disk, num_cpus, system):
+    """
+    Post-boot checkpoints are shared by every run with the same kernel,
+    disk and number of CPUs.
+    """
+    return checkpointDir(root_dir, 'boot_{}_{}_{}cpu'.format(
+                os.path.basename(kernel), os.path.basename(disk), num_cpus),
+                system)
+
+def roiCheckpointDir(root_dir, kernel, disk, num_cpus, benchmark_name, size,
+                     synthetic, system, trials = 1):
+    """
+    ROI checkpoints are taken at the first work begin, after the graph has
+    been generated or loaded, and are shared by every run of the same
+    benchmark and graph on the same number of CPUs. The guest has already
+    parsed -n by then, so runs with several trials get their own.
+    """
+    graph = 'g{}'.format(size) if synthetic else os.path.basename(size)
+    if trials > 1:
+        graph = '{}_n{}'.format(graph, trials)
+    return checkpointDir(root_dir, 'roi_{}_{}_{}cpu_{}_{}'.format(
+                benchmark_name, graph, num_cpus, os.path.basename(kernel),
+                os.path.basename(disk)), system)
+
+def takeCheckpoint(ckpt_dir):
+    # Several runs of a sweep may boot for the same checkpoint at once, the
+    # first one to finish wins
+    tmp_dir = '{}.{}'.format(ckpt_dir, os.getpid())
+    m5.checkpoint(tmp_dir)
+    try:
+        os.rename(tmp_dir, ckpt_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir)
+
+def isWorkBegin(cause):
+    # MySystem exits on every work item, MyRubySystem on the first one
+    return cause in ("work started count reach", "workbegin")
+
+def isWorkEnd(cause):
+    return cause in ("work items exit count reached", "workend")
+
+class StatsSeries(object):
+    """
+    Periodic ROI dumps go to their own stats output instead of stats.txt:
+    HDF5, one compact row per dump, when gem5 is built with it and a
+    separate text file otherwise. Rows are cumulative since the stats reset
+    at the start of the ROI, so the ROI section of stats.txt stays whole.
+    """
+    def __init__(self, interval):
+        self._interval = m5.ticks.fromSeconds(toLatency(interval))
+        self._main = list(m5.stats.outputList)
+        if hasattr(_m5.stats, 'initHDF5'):
+            m5.stats.addStatVisitor('h5://timeseries.h5')
+        else:
+            print("gem5 is built without HDF5, writing timeseries.txt")
+            m5.stats.addStatVisitor('timeseries.txt')
+        self._series = m5.stats.outputList[len(self._main):]
+        m5.stats.outputList[:] = self._main
+        self._rows = SectionLog(os.path.join(m5.options.outdir,
+                                             'timeseries.json'))
+
+    def simulate(self, label, begin_tick):
+        """m5.simulate() with a dump at the end of every interval, up to the
+        next exit event that is not the end of an interval. That exit is not
+        dumped: the caller dumps the ROI section at the same tick and gem5
+        skips a second dump in one tick. The tail of the ROI after the last
+        full interval is only in the ROI section."""
+        m5.stats.outputList[:] = self._series
+        try:
+            while True:
+                exit_event = m5.simulate(self._interval)
+                if exit_event.getCause() != "simulate() limit reached":
+                    return exit_event
+                m5.stats.dump()
+                self._rows.add(label, begin_tick, m5.curTick())
+        finally:
+            m5.stats.outputList[:] = self._main
+
+def runSampled(system, args):
+    """
+    Systematic sampling of the ROI: fast-forward on system.cpu, warm up the
+    caches on the warm-up CPUs, then measure one window on the detailed
+    CPU. Every window is dumped as its own stats section. Returns the
+    per-window memory metrics and the number of ROI ticks covered.
+    """
+    ff_ticks = m5.ticks.fromSeconds(toLatency(args.sample_ff))
+    warmup_ticks = m5.ticks.fromSeconds(toLatency(args.sample_warmup))
+    window_ticks = m5.ticks.fromSeconds(toLatency(args.sample_window))
+    warmup_cpus = system.getWarmupCpus()
+
+    sections = SectionLog(os.path.join(m5.options.outdir, 'sections.json'))
+    tail = StatsTail(os.path.join(m5.options.outdir, m5.options.stats_file))
+    start_tick = m5.curTick()
+    samples = []
+    while args.max_samples is None or len(samples) < args.max_samples:
+        exit_event = m5.simulate(ff_ticks)
+        if isWorkEnd(exit_event.getCause()):
+            break
+        system.switchCpus(system.cpu, warmup_cpus)
+        exit_event = m5.simulate(warmup_ticks)
+        if isWorkEnd(exit_event.getCause()):
+            break
+        system.switchCpus(warmup_cpus, system.detailedCpu)
+        m5.stats.reset()
+        begin_tick = m5.curTick()
+        exit_event = m5.simulate(window_ticks)
+        m5.stats.dump()
+        sections.add('sample{}'.format(len(samples)), begin_tick,
+                     m5.curTick())
+        samples.append(memCtrlMetrics(tail.read()[-1]))
+        print('Sample {} @ tick {}: {:.3f} GBps {:.2f} ns'.format(
+              len(samples) - 1, begin_tick, samples[-1]['bandwidth'],
+              samples[-1]['latency']))
+        if isWorkEnd(exit_event.getCause()):
+            break
+        system.switchCpus(system.detailedCpu, system.cpu)
+    return samples, m5.curTick() - start_tick
+
+def writeSampling(path, args, samples, roi_ticks):
+    estimate = summarize(samples, ('bandwidth', 'latency', 'queue_latency'))
+    roi_seconds = roi_ticks / float(m5.ticks.fromSeconds(1))
+    bandwidth = estimate['bandwidth']
+    if bandwidth['mean'] is not None:
+        # Bytes moved over the whole ROI at the estimated bandwidth
+        estimate['bytes'] = {'mean': bandwidth['mean'] * roi_seconds * 2 ** 30,
+                             'ci95': bandwidth['ci95'] * roi_seconds * 2 ** 30,
+                             'rel_ci95': bandwidth['rel_ci95'],
+                             'samples': bandwidth['samples']}
+    with open(path, 'w') as f:
+        json.dump({'fast_forward': args.sample_ff,
+                   'warmup': args.sample_warmup,
+                   'window': args.sample_window,
+                   'roi_ticks': roi_ticks,
+                   'estimate': estimate,
+                   'samples': samples}, f, indent = 4)
+    return estimate
+
 if __name__ == "__m5_main__":
     args = parse_arguments()
-
+    if args.profile_startup:
+        startup.profile()
+    if args.no_config_dump:
+        m5.options.dump_config = ''
+        m5.options.json_config = ''
 
     kernel = args.kernel
     disk = args.disk
@@ -94,55 +382,182 @@ if __name__ == "__m5_main__":
     benchmark_size = args.graph
     synthetic = args.synthetic
 
+    # Unset memory options keep the defaults of each system
+    mem = {}
+    if args.mem_type is not None:
+        mem['mem_type'] = args.mem_type
+    if args.bank_mapping is not None:
+        mem['bank_mapping'] = args.bank_mapping
+    if args.intlv_size is not None:
+        mem['intlv_size'] = args.intlv_size
+    if args.xor_low_bit is not None:
+        mem['xor_low_bit'] = args.xor_low_bit
+
     if (mem_sys == "classic"):
-        system = MySystem(kernel, disk, cpu_type, num_cpus)
+        host_parallel = {"auto": None, "on": True, "off": False}[
+                            args.host_parallel]
+        system = MySystem(cpu_type, num_cpus, num_chnls,
+                          args.banks_per_channel, args.mem_size, args.ff_cpu,
+                          host_parallel, **mem)
+        system.setKernel(kernel)
+        system.setDiskImage(disk)
     elif (mem_sys == "MI_example" or "MESI_Two_Level" or "MOESI_hammer"):
-        system = MyRubySystem(kernel, disk, mem_sys, num_cpus, num_chnls)
+        system = MyRubySystem(kernel, disk, mem_sys, num_cpus, num_chnls,
+                              args.ff_cpu, **mem)
+
+    jobs = [(benchmark_name, benchmark_size, synthetic)]
+    if args.jobs:
+        jobs += parseJobs(args.jobs, synthetic)
+        if args.roi_checkpoint or args.sample:
+            m5.fatal("--jobs runs a single boot through several ROIs, it "
+                     "cannot start from an ROI checkpoint or be sampled")
+    if args.trials > 1 and args.sample:
+        m5.fatal("--sample covers a single ROI, use --trials 1")
 
     # For workitems to work correctly
     # This will cause the simulator to exit simulation when the first work
     # item is reached and when the first work item is finished.
     system.work_begin_exit_count = 1
     system.work_end_exit_count = 1
+    if len(jobs) > 1 or args.trials > 1:
+        # Exit on the work items of every job and trial, not only the first
+        system.exit_on_work_items = True
 
     # Read in the script file passed in via an option.
     # This file gets read and executed by the simulated system after boot.
     # Note: The disk image needs to be configured to do this.
 
-    system.readfile = writeBenchScript(m5.options.outdir, benchmark_name,
-                                       benchmark_size, synthetic)
+    if len(jobs) > 1:
+        bench_script = writeBatchScript(m5.options.outdir, jobs, args.trials)
+    else:
+        bench_script = writeBenchScript(m5.options.outdir, benchmark_name,
+                                        benchmark_size, synthetic,
+                                        args.trials)
+    system.readfile = bench_script
+
+    boot_ckpt = None
+    roi_ckpt = None
+    restore = None
+    if args.checkpoint_dir:
+        boot_ckpt = bootCheckpointDir(args.checkpoint_dir, kernel, disk,
+                                      num_cpus, system)
+        if args.roi_checkpoint:
+            roi_ckpt = roiCheckpointDir(args.checkpoint_dir, kernel, disk,
+                                        num_cpus, benchmark_name,
+                                        benchmark_size, synthetic, system,
+                                        args.trials)
+        if roi_ckpt and os.path.isdir(roi_ckpt):
+            restore = roi_ckpt
+        elif os.path.isdir(boot_ckpt):
+            restore = boot_ckpt
+        else:
+            system.readfile = writeBootScript(m5.options.outdir)
 
     # set up the root SimObject and start the simulation
     root = Root(full_system = True, system = system)
+    system.writeChannelMap(os.path.join(m5.options.outdir, 'channels.json'))
     # m5.disableAllListeners()
-    root.sim_quantum = int(1e9) # 1 ms
+    if args.sim_quantum == "auto":
+        root.sim_quantum = system.getSimQuantum()
+    else:
+        # The tick frequency is only fixed at instantiate
+        root.sim_quantum = int(toLatency(args.sim_quantum) * 1e12)
 
     # instantiate all of the objects we've created above
-    m5.instantiate()
-
-    print("Running the simulation with: ", system.cpu)
-    exit_event = m5.simulate()
-    print('Exiting @ tick {} because {}'
-            .format(m5.curTick(), exit_event.getCause()))
-    if exit_event.getCause() == "work started count reach":
-        m5.stats.reset()
-        start_tick = m5.curTick()
-        start_insts = system.totalInsts()
-        # switching to atomic cpu if argument cpu == atomic
-        if cpu_type != 'kvm':
-            system.switchToTiming()
-            # system.switchCpus(system.cpu, system.timingCpu)
-            print("Switch to detailed cpu model")
+    startup.mark('build')
+    if restore:
+        print("Restoring checkpoint", restore)
+        m5.instantiate(restore)
     else:
-        print("ROI is not annotated!")
-        print('Exiting @ tick {} because {}'
-            .format(m5.curTick(), exit_event.getCause()))
-        exit()
+        m5.instantiate()
+    startup.mark('instantiate')
+    startup.write(os.path.join(m5.options.outdir, 'startup.json'))
+
+    if boot_ckpt and not restore:
+        exit_event = m5.simulate()
+        if exit_event.getCause() != "m5_exit instruction encountered":
+            m5.fatal("Boot did not reach the checkpoint: {}"
+                     .format(exit_event.getCause()))
+        print("Taking boot checkpoint", boot_ckpt)
+        takeCheckpoint(boot_ckpt)
+        # The guest reads the benchmark script next
+        shutil.copyfile(bench_script, system.readfile)
 
-    exit_event = m5.simulate()
-    m5.stats.dump()
-    m5.stats.reset()
-    if exit_event.getCause() == "work items exit count reached":
+    if restore is None or restore != roi_ckpt:
+        print("Running the simulation with: ", system.cpu)
+        exit_event = m5.simulate()
         print('Exiting @ tick {} because {}'
-            .format(m5.curTick(), exit_event.getCause()))
+                .format(m5.curTick(), exit_event.getCause()))
+        if not isWorkBegin(exit_event.getCause()):
+            print("ROI is not annotated!")
+            print('Exiting @ tick {} because {}'
+                .format(m5.curTick(), exit_event.getCause()))
+            exit()
+        if roi_ckpt:
+            print("Taking ROI checkpoint", roi_ckpt)
+            takeCheckpoint(roi_ckpt)
+
+    if args.sample:
+        samples, roi_ticks = runSampled(system, args)
+        estimate = writeSampling(os.path.join(m5.options.outdir,
+                                 'sampling.json'), args, samples, roi_ticks)
+        for name in ('bandwidth', 'latency'):
+            print('{}: {} +- {} ({} samples)'.format(name,
+                  estimate[name]['mean'], estimate[name]['ci95'],
+                  estimate[name]['samples']))
+    else:
+        sections = SectionLog(os.path.join(m5.options.outdir,
+                                           'sections.json'))
+        series = None
+        if args.stats_interval:
+            series = StatsSeries(args.stats_interval)
+        for i, (name, size, synth) in enumerate(jobs):
+            label = jobLabel(name, size, synth)
+            if i > 0:
+                # Fast-forward to the ROI of the next job
+                exit_event = m5.simulate()
+                if not isWorkBegin(exit_event.getCause()):
+                    print("ROI of {} is not annotated!".format(label))
+                    print('Exiting @ tick {} because {}'
+                        .format(m5.curTick(), exit_event.getCause()))
+                    break
+            # switching to atomic cpu if argument cpu == atomic
+            if cpu_type != 'kvm':
+                system.switchToTiming()
+                # system.switchCpus(system.cpu, system.timingCpu)
+                print("Switch to detailed cpu model")
+
+            for trial in range(args.trials):
+                info = {'benchmark': name, 'graph': size,
+                        'synthetic': synth}
+                trial_label = label
+                if args.trials > 1:
+                    # The first trial warms up caches and memory
+                    info.update(trial = trial, warmup = trial == 0)
+                    trial_label = '{}_trial{}'.format(label, trial)
+                if trial > 0:
+                    # Trials run back to back on the detailed CPU
+                    exit_event = m5.simulate()
+                    if not isWorkBegin(exit_event.getCause()):
+                        print("Trial {} of {} is not annotated!".format(
+                              trial, label))
+                        break
+                m5.stats.reset()
+                start_tick = m5.curTick()
+                start_insts = system.totalInsts()
+                if series:
+                    exit_event = series.simulate(trial_label, start_tick)
+                else:
+                    exit_event = m5.simulate()
+                m5.stats.dump()
+                sections.add(trial_label, start_tick, m5.curTick(), **info)
+                m5.stats.reset()
+                if not isWorkEnd(exit_event.getCause()):
+                    break
+                print('Exiting @ tick {} because {}'
+                    .format(m5.curTick(), exit_event.getCause()))
+            if not isWorkEnd(exit_event.getCause()):
+                break
+            if cpu_type != 'kvm' and i + 1 < len(jobs):
+                system.switchFromTiming()
     print("END OF THE SIMULATION")
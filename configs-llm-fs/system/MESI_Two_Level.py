@@ -51,7 +51,7 @@ class MESITwoLevelCache(RubySystem):
         super(MESITwoLevelCache, self).__init__()
 
 
-    def setup(self, system, cpus, mem_ctrls, mem_schds, dma_ports, iobus, bpc):
+    def setup(self, system, cpus, mem_channels, dma_ports, iobus):
         """Set up the Ruby cache subsystem. Note: This can't be done in the
            constructor because many of these items require a pointer to the
            ruby system (self). This causes infinite recursion in initialize()
@@ -73,8 +73,8 @@ class MESITwoLevelCache(RubySystem):
         self.controllers = \
             [L1Cache(system, self, cpu, self._numL2Caches) for cpu in cpus] + \
             [L2Cache(system, self, self._numL2Caches) for num in range(self._numL2Caches)] + \
-            [DirController(self, system.mem_ranges, mem_ctrls[j*bpc:(bpc*(j+1))],
-                        mem_schds[j]) for j in range(len(mem_schds))] + \
+            [DirController(self, system.mem_ranges, ctrls, port)
+                for ctrls, port in mem_channels] + \
             [DMAController(self) for i in range(len(dma_ports))]
 
         # Create one sequencer per CPU and dma controller.
@@ -104,7 +104,8 @@ class MESITwoLevelCache(RubySystem):
 
         # Create the network and connect the controllers.
         # NOTE: This is quite different if using Garnet!
-        self.network.connectControllers(self.controllers, len(cpus), len(mem_schds))
+        self.network.connectControllers(self.controllers, len(cpus),
+                                        len(mem_channels))
         self.network.vcs_per_vnet = 4
         self.network.ni_flit_size = 128
         self.network.routing_algorithm = 0
@@ -262,7 +263,7 @@ class DirController(Directory_Controller):
         cls._version += 1 # Use count for this particular type
         return cls._version - 1
 
-    def __init__(self, ruby_system, ranges, mem_ctrls, mem_sched):
+    def __init__(self, ruby_system, ranges, mem_ctrls, port):
         """ranges are the memory ranges assigned to this controller.
         """
         # if len(mem_ctrls) > 1:
@@ -275,7 +276,7 @@ class DirController(Directory_Controller):
             self.addr_ranges.append(ctrl.dram.range)
         self.ruby_system = ruby_system
         self.directory = RubyDirectoryMemory()
-        self.memory_out_port = mem_sched.cpu_side
+        self.memory_out_port = port
         self.connectQueues(ruby_system)
 
     def connectQueues(self, ruby_system):
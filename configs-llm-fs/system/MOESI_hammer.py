@@ -51,7 +51,7 @@ class MOESIHammerCache(RubySystem):
         super(MOESIHammerCache, self).__init__()
 
 
-    def setup(self, system, cpus, mem_ctrls, mem_schds, dma_ports, iobus, bpc):
+    def setup(self, system, cpus, mem_channels, dma_ports, iobus):
         """Set up the Ruby cache subsystem. Note: This can't be done in the
            constructor because many of these items require a pointer to the
            ruby system (self). This causes infinite recursion in initialize()
@@ -66,9 +66,12 @@ class MOESIHammerCache(RubySystem):
 
 
 
+        # One directory per channel, mem_channels holds the controllers of
+        # each and the port the channel takes requests on
+        num_ctrls = sum(len(ctrls) for ctrls, port in mem_channels)
         pf_size = MemorySize('1 MB')
-        pf_size.value = pf_size.value * 2 * self._numL2Caches / len(mem_ctrls)
-        dir_bits = int(math.log(len(mem_schds), 2))
+        pf_size.value = pf_size.value * 2 * self._numL2Caches / num_ctrls
+        dir_bits = int(math.ceil(math.log(len(mem_channels), 2)))
         pf_bits = int(math.log(pf_size.value, 2))
         block_size_bits = int(math.log(system.cache_line_size, 2))
         if dir_bits > 0:
@@ -90,8 +93,8 @@ class MOESIHammerCache(RubySystem):
         # each per CPU core.
         self.controllers = \
             [L1Cache(system, self, cpu, self._numL2Caches) for cpu in cpus] + \
-            [DirController(self, system.mem_ranges, mem_ctrls[j*bpc:(bpc*(j+1))],
-                        mem_schds[j], pf_size, pf_start_bit) for j in range(len(mem_schds))] + \
+            [DirController(self, system.mem_ranges, ctrls, port, pf_size,
+                           pf_start_bit) for ctrls, port in mem_channels] + \
             [DMAController(self) for i in range(len(dma_ports))]
         print(len(dma_ports))
         print(len(self.controllers))
@@ -123,7 +126,8 @@ class MOESIHammerCache(RubySystem):
 
         # Create the network and connect the controllers.
         # NOTE: This is quite different if using Garnet!
-        self.network.connectControllers(self.controllers, len(cpus), len(mem_schds))
+        self.network.connectControllers(self.controllers, len(cpus),
+                                        len(mem_channels))
 
         # Set up a proxy port for the system_port. Used for load binaries and
         # other functional-only things.
@@ -238,7 +242,7 @@ class DirController(Directory_Controller):
         cls._version += 1 # Use count for this particular type
         return cls._version - 1
 
-    def __init__(self, ruby_system, ranges, mem_ctrls, mem_sched, pf_size, pf_start_bit):
+    def __init__(self, ruby_system, ranges, mem_ctrls, port, pf_size, pf_start_bit):
         """ranges are the memory ranges assigned to this controller.
         """
         super(DirController, self).__init__()
@@ -251,7 +255,7 @@ class DirController(Directory_Controller):
             self.addr_ranges.append(ctrl.dram.range)
         self.ruby_system = ruby_system
         self.directory = RubyDirectoryMemory()
-        self.memory_out_port = mem_sched.cpu_side
+        self.memory_out_port = port
         self.probe_filter_enabled = True
         self.full_bit_dir_enabled = True
         pf = self.ProbeFilter
@@ -31,11 +31,20 @@ import m5
 from m5.objects import *
 from m5.util import convert
 from .fs_tools import *
+from memsys.backends import channelGroups, connectScheds, getBackend, \
+                            writeChannelPaths
 import math
 class MyRubySystem(System):
 
-    def __init__(self, kernel, disk, mem_sys, num_cpus, num_chnls):
+    def __init__(self, kernel, disk, mem_sys, num_cpus, num_chnls,
+                 ff_cpu = 'auto', intlv_size = 64, xor_low_bit = 0,
+                 mem_type = 'LLM_SA', bank_mapping = 'contiguous'):
         super(MyRubySystem, self).__init__()
+        self._bank_mapping = bank_mapping
+        self._backend = getBackend(mem_type)
+        self._intlv_size = intlv_size
+        self._xor_low_bit = xor_low_bit
+        self._ff_cpu = fastForwardCpu(ff_cpu)
 
         # self._host_parallel = cpu_type == "kvm"
         self._num_channels = num_chnls
@@ -81,10 +90,16 @@ class MyRubySystem(System):
             from .MOESI_hammer import MOESIHammerCache
             self.caches = MOESIHammerCache()
 
-        self.caches.setup(self, self.cpu, self.mem_ctrls, self.mem_scheds,
+        self.caches.setup(self, self.cpu, self._mem_channels,
                           [self.pc.south_bridge.ide.dma,
                            self.iobus.mem_side_ports],
-                          self.iobus, self._bpc)
+                          self.iobus)
+
+    def getFastForwardCpu(self):
+        return self._ff_cpu
+
+    def getSimQuantum(self):
+        return kvmSimQuantum(len(self.cpu) if self._ff_cpu == 'kvm' else 1)
 
     def totalInsts(self):
         return sum([cpu.totalInsts() for cpu in self.cpu])
@@ -100,11 +115,16 @@ class MyRubySystem(System):
             c.createThreads()
 
     def createCPU(self, num_cpus):
-        self.cpu = [X86KvmCPU(cpu_id = i) for i in range(num_cpus)]
+        if self._ff_cpu == 'kvm':
+            self.cpu = [X86KvmCPU(cpu_id = i) for i in range(num_cpus)]
+        else:
+            self.cpu = [NonCachingAtomicCPU(cpu_id = i)
+                        for i in range(num_cpus)]
         self.createCPUThreads(self.cpu)
         self.setupInterrupts()
-        self.createEventQueues(self.cpu)
-        self.kvm_vm = KvmVM()
+        if self._ff_cpu == 'kvm':
+            self.createEventQueues(self.cpu)
+            self.kvm_vm = KvmVM()
         self.mem_mode = 'atomic_noncaching'
 
         self.timingCpu = [TimingSimpleCPU(cpu_id = i, switched_out = True)
@@ -135,6 +155,10 @@ class MyRubySystem(System):
     def switchFromDetailed(self):
         self.switchCpus(self.detailedCpu, self.cpu)
 
+    def getWarmupCpus(self):
+        # Ruby does not support atomic accesses, warm up in timing mode
+        return self.timingCpu
+
     def switchCpus(self, old, new):
         assert(new[0].switchedOut())
         m5.switchCpus(self, list(zip(old, new)))
@@ -153,45 +177,30 @@ class MyRubySystem(System):
         self._createMemoryControllers(self._num_channels, DDR3_1600_8x8)
 
     def _createMemoryControllers(self, num, cls):
-
-        mem_ctrls = []
-        num_int = num * self._bpc
-        bpc = self._bpc
-        addr_range = self.mem_ranges[0]
-        intlv_low_bit = 6
-        intlv_bits = int(math.log(num_int, 2))
-
-        for i in range(num_int):
-            interface = LLM()
-            interface.range = AddrRange(addr_range.start, size = addr_range.size(),
-                        intlvHighBit = intlv_low_bit + intlv_bits - 1,
-                        xorHighBit = 0,
-                        intlvBits = intlv_bits,
-                        intlvMatch = i)
-            interface.subarray_per_bank = 8
-            ctrl = MemCtrl()
-            ctrl.dram = interface
-            interface.device_size = str(int(256 / bpc)) + 'MB'
-            ctrl.dram.read_buffer_size = 2
-            ctrl.dram.write_buffer_size = 8
-            ctrl.dram.page_policy = 'close'
-            ctrl.write_high_thresh_perc = 100
-            ctrl.write_low_thresh_perc = 90
-            ctrl.min_writes_per_switch = 1
-            mem_ctrls.append(ctrl)
-        self.mem_ctrls = mem_ctrls
-
-        scheds = [MemScheduler(read_buffer_size = 1,
-                            write_buffer_size = 1,
-                            resp_buffer_size = 0,
-                            unified_queue = True,
-                            service_write_threshold = 60)
-                            for i in range(num)]
-        self.mem_scheds = scheds
-
-        for i, mem_ctrl in enumerate(self.mem_ctrls):
-            # print(int(i / bpc))
-            self.mem_scheds[int(i / bpc)].mem_side = mem_ctrl.port
+        backend = self._backend
+        params = {}
+        if backend.per_bank:
+            # Banks keep their size from before the backend registry, not
+            # their share of the 1GB range
+            params['device_size'] = str(int(256 / self._bpc)) + 'MB'
+        self.mem_ctrls = backend.createCtrls(self.mem_ranges[0], num,
+                                             self._bpc, self._intlv_size,
+                                             self._xor_low_bit, **params)
+        # The Ruby system has always used smaller scheduler buffers
+        scheds = backend.createScheds(num, read_buffer_size = 1,
+                                      write_buffer_size = 1,
+                                      resp_buffer_size = 0)
+        if scheds:
+            self.mem_scheds = scheds
+            connectScheds(self.mem_scheds, self.mem_ctrls,
+                          self._bank_mapping)
+        self._mem_channels = channelGroups(self.mem_ctrls, scheds,
+                                           self._bank_mapping)
+
+    def writeChannelMap(self, path):
+        """channels.json for harness.balance, once the system has a Root."""
+        scheds = self.mem_scheds if self._backend.per_bank else []
+        writeChannelPaths(path, self.mem_ctrls, scheds, self._bank_mapping)
 
     def initFS(self, cpus):
         self.pc = Pc()
@@ -31,22 +31,36 @@ from m5.objects import *
 from m5.util import convert
 from .fs_tools import *
 from .caches import *
+from memsys.backends import connectScheds, getBackend, writeChannelPaths
 from math import log
 import math
 
 class MySystem(System):
 
-    def __init__(self, cpu_type, num_cpus, num_chnls, banks_per_chnl):
+    def __init__(self, cpu_type, num_cpus, num_chnls, banks_per_chnl,
+                 mem_size = None, ff_cpu = 'auto', host_parallel = None,
+                 intlv_size = 64, xor_low_bit = 20, mem_type = 'LLM',
+                 bank_mapping = 'strided'):
         super(MySystem, self).__init__()
+        self._bank_mapping = bank_mapping
+        self._backend = getBackend(mem_type)
+        self._intlv_size = intlv_size
+        self._xor_low_bit = xor_low_bit
         no_kvm=False
-        self._host_parallel = cpu_type == "kvm"
+        self._ff_cpu = fastForwardCpu(ff_cpu)
+        # Only KVM CPUs can run in their own event queues. By default every
+        # multi-core KVM system does, the timing and detailed CPUs it
+        # switches to at the ROI stay on queue 0
+        if host_parallel is None:
+            host_parallel = num_cpus > 1
+        self._host_parallel = host_parallel and self._ff_cpu == "kvm"
         self._num_cpus = num_cpus
         self.initialize()
 
         # Create the CPUs for our system.
         self.createCPU(num_cpus)
 
-        self.createMemory(num_chnls, banks_per_chnl)
+        self.createMemory(num_chnls, banks_per_chnl, mem_size)
 
         self.initFS(self.membuses[0], num_cpus)
 
@@ -54,13 +68,15 @@ class MySystem(System):
         self.createCacheHierarchy()
         if self._host_parallel:
             # To get the KVM CPUs to run on different host CPUs
-            # Specify a different event queue for each CPU
-            for i,cpu in enumerate(self.cpu):
-                for obj in cpu.descendants():
-                    obj.eventq_index = 0
-                cpu.eventq_index = i + 1
+            # Specify a different event queue for each CPU. This has to
+            # follow createCacheHierarchy so the caches stay on queue 0
+            self.createEventQueues(self.cpu)
     def getHostParallel(self):
         return self._host_parallel
+    def getSimQuantum(self):
+        return kvmSimQuantum(len(self.cpu) if self._host_parallel else 1)
+    def getFastForwardCpu(self):
+        return self._ff_cpu
     def initialize(self):
         # Set up the clock domain and the voltage domain
         self.clk_domain = SrcClockDomain()
@@ -85,10 +101,12 @@ class MySystem(System):
     def totalInsts(self):
         return sum([cpu.totalInsts() for cpu in self.cpu])
 
-    def createMemory(self, num_chnls, banks_per_chnl):
+    def createMemory(self, num_chnls, banks_per_chnl, mem_size = None):
         self._num_chnls = num_chnls
         self._bpc = banks_per_chnl
-        self._mem_size = str(512 * self._num_chnls) + 'MB'
+        # A fixed size keeps the memory layout, and so checkpoints,
+        # independent of the number of channels
+        self._mem_size = mem_size or str(512 * self._num_chnls) + 'MB'
         self.mem_ranges = [AddrRange('100MB'), # For kernel
                            AddrRange(0xC0000000, size=0x100000), # For I/0
                            AddrRange(Addr('4GB'), size = self._mem_size) # All data
@@ -127,11 +145,15 @@ class MySystem(System):
             cpu.createThreads()
 
     def createCPU(self, num_cpus):
-        self.cpu = [X86KvmCPU(cpu_id = i) for i in range(num_cpus)]
+        if self._ff_cpu == 'kvm':
+            self.cpu = [X86KvmCPU(cpu_id = i) for i in range(num_cpus)]
+            self.kvm_vm = KvmVM()
+        else:
+            self.cpu = [NonCachingAtomicCPU(cpu_id = i)
+                        for i in range(num_cpus)]
         self.createCPUThreads(self.cpu)
         self.setupInterrupts(self.cpu)
         # self.createEventQueues(self.cpu)
-        self.kvm_vm = KvmVM()
         self.mem_mode = 'atomic_noncaching'
 
         self.atomicCpu = [AtomicSimpleCPU(cpu_id = i, switched_out = True)
@@ -166,6 +188,10 @@ class MySystem(System):
     def switchFromDetailed(self):
         self.switchCpus(self.detailedCpu, self.cpu)
 
+    def getWarmupCpus(self):
+        # Atomic accesses warm up the classic caches functionally
+        return self.atomicCpu
+
     # def createCPUThreads(self, cpu):
     #     for c in cpu:
     #         c.createThreads()
@@ -253,66 +279,38 @@ class MySystem(System):
         self._createKernelMemoryController()
 
 
-        '''
-        interface.device_size = str(int(512 / bpc)) + 'MB'
-                ctrl.dram.read_buffer_size = 2
-                ctrl.dram.write_buffer_size = 8
-                ctrl.dram.page_policy = page_policy
-                ctrl.write_high_thresh_perc = 100
-                ctrl.write_low_thresh_perc = 90
-                ctrl.min_writes_per_switch = 1
-        '''
-        num_chnls = self._num_chnls
-        bpc = self._bpc
-        num_int = self._num_chnls * bpc
-        ranges = self._getInterleaveRanges(self.mem_ranges[-1],
-                                        num_int, 6, 20)
-        mem_ctrls = []
-        addr_range = self.mem_ranges[-1]
-        intlv_low_bit = 6
-        intlv_bits = int(math.log(num_int, 2))
-
-        for i in range(num_int):
-            interface = LLM2()
-            # interface.range = AddrRange(addr_range.start, size = addr_range.size(),
-            #             intlvHighBit = intlv_low_bit + intlv_bits - 1,
-            #             xorHighBit = 0,
-            #             intlvBits = intlv_bits,
-            #             intlvMatch = i)
-            interface.range = ranges[i]
-            ctrl = MemCtrl()
-            ctrl.dram = interface
-            interface.device_size = str(int(512 / bpc)) + 'MB'
-            ctrl.dram.read_buffer_size = 2
-            ctrl.dram.write_buffer_size = 8
-            ctrl.dram.page_policy = 'close'
-            ctrl.write_high_thresh_perc = 100
-            ctrl.write_low_thresh_perc = 90
-            ctrl.min_writes_per_switch = 1
-
-
-        # self.mem_ctrls = mem_ctrls
-            mem_ctrls.append(ctrl)
-        scheds = [MemScheduler(read_buffer_size = 1,
-                            write_buffer_size = 32,
-                            resp_buffer_size = 64,
-                            unified_queue = True,
-                            service_write_threshold = 60)
-                            for i in range(self._num_chnls)]
-
-        self.mem_scheds = scheds
-
-        for i, mem_ctrl in enumerate(mem_ctrls):
-            self.mem_scheds[i % self._num_chnls].mem_side = mem_ctrl.port
-
-        for membus in self.membuses:
-            for mem_sched in self.mem_scheds:
-        # for sched in scheds:
-            # sched.cpu_side = membus.mem_side_ports
-                mem_sched.cpu_side = membus.mem_side_ports
+        backend = self._backend
+        params = {}
+        if backend.per_bank:
+            # Banks keep their size from before the backend registry, not
+            # their share of --mem-size
+            params['device_size'] = str(int(512 / self._bpc)) + 'MB'
+        mem_ctrls = backend.createCtrls(self.mem_ranges[-1], self._num_chnls,
+                                        self._bpc, self._intlv_size,
+                                        self._xor_low_bit, **params)
+        scheds = backend.createScheds(self._num_chnls)
+        if scheds:
+            self.mem_scheds = scheds
+            connectScheds(self.mem_scheds, mem_ctrls, self._bank_mapping)
+            for membus in self.membuses:
+                for mem_sched in self.mem_scheds:
+                    mem_sched.cpu_side = membus.mem_side_ports
+        else:
+            # A controller has a single port, so the per-CPU buses reach
+            # the channels through one more crossbar
+            self.dataBar = SystemXBar(width = 64,
+                                      max_routing_table_size = 16777216)
+            for membus in self.membuses:
+                membus.mem_side_ports = self.dataBar.cpu_side_ports
+            for ctrl in mem_ctrls:
+                ctrl.port = self.dataBar.mem_side_ports
 
         self.mem_cntrls = mem_ctrls
-        # self.mem_scheds = mem_scheds
+
+    def writeChannelMap(self, path):
+        """channels.json for harness.balance, once the system has a Root."""
+        scheds = self.mem_scheds if self._backend.per_bank else []
+        writeChannelPaths(path, self.mem_cntrls, scheds, self._bank_mapping)
 
     def _createKernelMemoryController(self):
         self.kernelBar = SystemXBar(width = 64,
@@ -331,25 +329,6 @@ class MySystem(System):
         # ctrl.port = self.membus.mem_side_ports
         # return ctrl
 
-    def _getInterleaveRanges(self, rng, num, intlv_low_bit, xor_low_bit):
-        from math import log
-        bits = int(log(num, 2))
-        if 2**bits != num:
-            m5.fatal("Non-power of two number of memory controllers")
-
-        intlv_bits = bits
-        ranges = [
-            AddrRange(start=rng.start,
-                      end=rng.end,
-                      intlvHighBit = intlv_low_bit + intlv_bits - 1,
-                      xorHighBit = xor_low_bit + intlv_bits - 1,
-                      intlvBits = intlv_bits,
-                      intlvMatch = i)
-                for i in range(num)
-            ]
-
-        return ranges
-
     def initFS(self, membus, cpus):
         self.pc = Pc()
 
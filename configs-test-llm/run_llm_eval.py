@@ -1,20 +1,34 @@
 from m5.util.convert import *
-from m5.util import addToPath
+from m5.util import addToPath, fatal, warn
 # import m5.pystats.loader as loader
 addToPath('system')
 addToPath('../gem5/configs')
+addToPath('..')
 
 from TestBenchSystem import *
 from TrafficGen import *
+from ResultCache import *
+from harness.matrix import pointDir
+from harness.stats import *
+from harness.startup import StartupTimer
+from harness.steady import SteadyStateDetector
+from harness.writedrain import mixThreshold, loadTable
+from memsys.backends import BANK_MAPPINGS
 
 import argparse
+import copy
+import json
 import math
+import os
+import sys
 
+startup = StartupTimer()
 
 parser = argparse.ArgumentParser()
 
 parser.add_argument('mem_type', type = str,
-                    help = '''memory model to simulate''')
+                    help = '''memory backend to simulate, e.g. LLM or HBM,
+                    see memsys/backends.py''')
 
 parser.add_argument('num_chnls', type = int, default = 1,
                     help = 'number of channels in the memory system, \
@@ -26,9 +40,15 @@ parser.add_argument('banks_per_channel', type = int, default = 32,
 parser.add_argument('unified_queue', type = int, default = False,
                     help = 'Unified queue at the MemScheduler')
 
-parser.add_argument('wr_perc', type = int,
+def writeThreshold(text):
+    return text if text == 'mix' else int(text)
+
+parser.add_argument('wr_perc', type = writeThreshold,
                     help = '''Percentage of write request
-                    to force servicing writes in MemScheduler''')
+                    to force servicing writes in MemScheduler, or mix to
+                    pick it once from rd_perc before the run, see
+                    harness/writedrain.py. mix does not work with --points
+                    or --phases''')
 
 parser.add_argument('paging_policy', type = str,
                     help = '''paging policy''')
@@ -44,7 +64,7 @@ parser.add_argument('duration', type = str,
                     help = '''real time duration to generate traffic
                     e.g. 1s, 1ms, 1us, 1ns''')
 
-parser.add_argument('injection_rate', type = int,
+parser.add_argument('injection_rate', type = float,
                     help = '''The amount of traffic generated
                     by the traffic generator in GBps''')
 
@@ -52,40 +72,444 @@ parser.add_argument('rd_perc', type = int,
                     help = '''Percentage of read request,
                     rd_perc = 100 - write requests percentage''')
 
-parser.add_argument('data_limit', type = int, default = 0)
+parser.add_argument('data_limit', type = int, default = 0,
+                    help = '''bytes to move across all traffic generators
+                    before the simulation ends, 0 for fixed-time runs''')
+
+parser.add_argument('--cache-dir', type = str, default = None,
+                    help = '''reuse the stats.txt of an identical earlier
+                    run from this directory instead of simulating''')
+
+parser.add_argument('--points', type = str, default = None,
+                    help = '''comma separated mode:injection_rate:rd_perc
+                    points, e.g. LINEAR:4:60,RANDOM:8:100. The test bench is
+                    instantiated once and every point is simulated in a
+                    forked child with its own outdir. mode, injection_rate
+                    and rd_perc are ignored''')
+
+parser.add_argument('--fork-jobs', type = int, default = None,
+                    help = '''number of forked points to simulate at the
+                    same time, defaults to the number of host cores''')
+
+parser.add_argument('--phases', type = str, default = None,
+                    help = '''comma separated mode:injection_rate:rd_perc
+                    or mode:injection_rate:rd_perc:duration phases, run one
+                    after another in one simulation. Stats are dumped and
+                    reset after every phase and labelled in sections.json.
+                    mode, injection_rate and rd_perc are ignored. Not with a
+                    non-zero data_limit or --steady-state''')
+
+parser.add_argument('--drain', type = str, default = '100ns',
+                    help = '''idle time after each phase for its requests
+                    to complete before the stats are dumped''')
+
+parser.add_argument('--check-period', type = str, default = '100ns',
+                    help = '''how often the bytes moved are checked when
+                    data_limit is set. Checks read the generators' counters
+                    and do not dump stats''')
+
+parser.add_argument('--steady-state', action = 'store_true',
+                    help = '''stop before duration once bandwidth,
+                    latency and queueing latency are stable over consecutive
+                    windows. Not with a
+                    non-zero data_limit''')
+
+parser.add_argument('--warmup', type = str, default = '1us',
+                    help = '''initial time discarded from the stats in
+                    steady-state mode''')
+
+parser.add_argument('--window', type = str, default = '500ns',
+                    help = '''stats are dumped and checked every window in
+                    steady-state mode''')
+
+parser.add_argument('--tolerance', type = float, default = 0.02,
+                    help = '''relative band the windows must stay in''')
+
+parser.add_argument('--stable-windows', type = int, default = 3,
+                    help = '''consecutive windows that must agree''')
+
+parser.add_argument('--intlv-size', type = int, default = None,
+                    help = '''bytes mapped to one bank (LLM) or channel
+                    (HBM) before moving to the next, defaults to the cache
+                    line''')
+
+parser.add_argument('--xor-low-bit', type = int, default = 0,
+                    help = '''lowest address bit XORed into the bank or
+                    channel select bits, 0 for no hashing''')
+
+parser.add_argument('--interconnect', type = str, default = 'private',
+                    choices = ['private', 'shared', 'router'],
+                    help = '''LLM traffic generators to schedulers: a
+                    crossbar per generator (private), one shared crossbar
+                    or one zero-latency address router''')
+
+parser.add_argument('--bank-mapping', type = str, default = 'strided',
+                    choices = BANK_MAPPINGS,
+                    help = '''LLM banks to schedulers: bank i to scheduler
+                    i % channels (strided), consecutive blocks of banks
+                    (contiguous), or strided with every row of banks
+                    rotated by a hash (hashed)''')
+
+parser.add_argument('--sched-read-buffer', type = int, default = None,
+                    help = '''read buffer entries of every MemScheduler''')
+
+parser.add_argument('--sched-write-buffer', type = int, default = None,
+                    help = '''write buffer entries of every MemScheduler''')
+
+parser.add_argument('--sched-resp-buffer', type = int, default = None,
+                    help = '''response buffer entries of every
+                    MemScheduler''')
+
+parser.add_argument('--bank-read-buffer', type = int, default = None,
+                    help = '''read buffer entries of every bank (LLM) or
+                    channel (HBM) controller''')
+
+parser.add_argument('--bank-write-buffer', type = int, default = None,
+                    help = '''write buffer entries of every bank (LLM) or
+                    channel (HBM) controller''')
+
+parser.add_argument('--wr-table', type = str, default = None,
+                    help = '''rd_perc to wr_perc table for wr_perc mix,
+                    as written by run_tune.py write-drain''')
+
+parser.add_argument('--event-queues', type = int, default = 1,
+                    help = '''unsafe, needs --unsafe-event-queues: simulate
+                    channels and traffic generators on this many event
+                    queues, one host thread each. Crossbars call into other
+                    queues without locking, so runs can race''')
+
+parser.add_argument('--unsafe-event-queues', action = 'store_true',
+                    help = '''accept the data races of --event-queues above
+                    1. Results are not valid measurements''')
+
+parser.add_argument('--sim-quantum', type = str, default = 'auto',
+                    help = '''synchronization quantum between the event
+                    queues, e.g. 1ns. auto uses the shortest crossbar
+                    latency between queues''')
+
+parser.add_argument('--profile-startup', action = 'store_true',
+                    help = '''profile config building and instantiate,
+                    reporting each startup phase and the slowest functions
+                    in startup.json''')
+
+parser.add_argument('--no-config-dump', action = 'store_true',
+                    help = '''do not write config.ini and config.json,
+                    e.g. for the points of a sweep''')
+
+def parsePoints(text):
+    points = []
+    for point in text.split(','):
+        mode, injection_rate, rd_perc = point.split(':')
+        points.append((mode, float(injection_rate), int(rd_perc)))
+    return points
+
+def setInjectionRate(options, injection_rate):
+    injection_period = int((1e12 * options.block_size) /
+                        (injection_rate * 1073741824))
+    options.min_period = injection_period
+    options.max_period = injection_period
+
+def startTraffic(system, options):
+    if options.mode == 'LINEAR':
+        for i, tgen in enumerate(system.tgens):
+            options.min_addr = system.linearStart(i)
+            tgen.start(createLinearTraffic(tgen, options))
+    # elif options.mode == 'LINEAR':
+    #     for tgen in system.tgens:
+    #         tgen.start(createLinearTraffic(tgen, options))
+    elif options.mode == 'RANDOM':
+        for tgen in system.tgens:
+            tgen.start(createRandomTraffic(tgen, options))
+    else:
+        print('Traffic type not supported!')
+
+def runSteadyState(system, options):
+    """Simulate in windows after a discarded warm-up and stop as soon as
+    the windows agree, or at duration. Stats are dumped cumulatively since
+    the warm-up after every window, so the last section covers the whole
+    measured run."""
+    warmup = int(toLatency(options.warmup) * 1e12)
+    window = int(toLatency(options.window) * 1e12)
+    tail = StatsTail(os.path.join(m5.options.outdir, m5.options.stats_file))
+    sections = SectionLog(os.path.join(m5.options.outdir, 'sections.json'))
+    detector = SteadyStateDetector(metrics = ('bandwidth', 'latency',
+                                              'queue_latency'),
+                                   tolerance = options.tolerance,
+                                   windows = options.stable_windows)
+
+    startTraffic(system, options)
+    if warmup:
+        m5.simulate(warmup)
+    m5.stats.reset()
+
+    previous = {}
+    converged_tick = None
+    while m5.curTick() < options.duration:
+        begin = m5.curTick()
+        exit_event = m5.simulate(min(window, options.duration - begin))
+        m5.stats.dump()
+        cumulative = tail.read()[-1]
+        metrics = llmEvalMetrics(statDelta(cumulative, previous))
+        previous = cumulative
+        sections.add('window{}'.format(len(detector.history)), begin,
+                     m5.curTick(), cumulative_since = warmup, **metrics)
+        if detector.add(metrics):
+            converged_tick = m5.curTick()
+            break
+        if exit_event.getCause() != 'simulate() limit reached':
+            break
+
+    result = dict(llmEvalMetrics(previous),
+                  converged = converged_tick is not None,
+                  convergence_tick = converged_tick,
+                  warmup_ticks = warmup,
+                  windows = len(detector.history))
+    with open(os.path.join(m5.options.outdir, 'steady_state.json'),
+              'w') as f:
+        json.dump(result, f, indent = 4)
+    if converged_tick is None:
+        print('No steady state reached @ tick {}'.format(m5.curTick()))
+    else:
+        print('Steady state reached @ tick {}'.format(converged_tick))
+
+def bytesMoved(system):
+    """Bytes the traffic generators read and wrote so far, read from their
+    scalar stats in place instead of through a stats dump."""
+    moved = 0
+    for tgen in system.tgens:
+        for info in tgen.getCCObject().getStats():
+            if info.name in ('bytesRead', 'bytesWritten'):
+                moved += info.value
+    return int(moved)
+
+def runDataLimit(system, options):
+    """Fixed-work mode: simulate until the traffic generators together
+    moved data_limit bytes and report the time it took. duration remains
+    the upper bound. The stats are dumped once, at the end."""
+    period = int(toLatency(options.check_period) * 1e12)
+
+    startTraffic(system, options)
+    moved = 0
+    done_tick = None
+    while m5.curTick() < options.duration:
+        exit_event = m5.simulate(min(period,
+                                     options.duration - m5.curTick()))
+        moved = bytesMoved(system)
+        if moved >= options.data_limit:
+            done_tick = m5.curTick()
+            break
+        if exit_event.getCause() != 'simulate() limit reached':
+            break
+    m5.stats.dump()
+
+    result = {'data_limit': options.data_limit,
+              'bytes': moved,
+              'completed': done_tick is not None,
+              'completion_tick': done_tick,
+              'check_period_ticks': period}
+    with open(os.path.join(m5.options.outdir, 'completion.json'), 'w') as f:
+        json.dump(result, f, indent = 4)
+    if done_tick is None:
+        print('Moved {} of {} bytes @ tick {}'.format(moved,
+              options.data_limit, m5.curTick()))
+    else:
+        print('Moved {} bytes @ tick {}'.format(moved, done_tick))
+
+def simulateTraffic(system, options):
+    if options.data_limit:
+        runDataLimit(system, options)
+    elif options.steady_state:
+        runSteadyState(system, options)
+    else:
+        startTraffic(system, options)
+        m5.simulate()
+
+def parsePhases(text, options):
+    phases = []
+    for spec in text.split(','):
+        fields = spec.split(':')
+        phase = copy.copy(options)
+        phase.mode = fields[0]
+        phase.injection_rate = float(fields[1])
+        phase.rd_perc = int(fields[2])
+        if len(fields) > 3:
+            phase.duration = int(toLatency(fields[3]) * 1e12)
+        if phase.mode not in ('LINEAR', 'RANDOM'):
+            fatal('Traffic type {} not supported!'.format(phase.mode))
+        setInjectionRate(phase, phase.injection_rate)
+        phase.label = 'phase{}_{}_BW_{:g}_RD_{}'.format(len(phases),
+                            phase.mode, phase.injection_rate, phase.rd_perc)
+        phases.append(phase)
+    return phases
+
+def runPhases(system, options, phases):
+    """Simulate the phases back to back in one simulation, with the stats
+    of each phase in its own stats.txt section."""
+    drain = int(toLatency(options.drain) * 1e12)
+    sections = SectionLog(os.path.join(m5.options.outdir, 'sections.json'))
+    for i, tgen in enumerate(system.tgens):
+        tgen.start(createPhasedTraffic(tgen, phases, drain,
+                                           system.linearStart(i)))
+    for i, phase in enumerate(phases):
+        begin = m5.curTick()
+        # The idle state after each phase lets its requests complete.
+        # m5.drain() would stop the generators for good, they are never
+        # resumed
+        m5.simulate(phase.duration + drain)
+        sections.add(phase.label, begin, m5.curTick(), mode = phase.mode,
+                     injection_rate = phase.injection_rate,
+                     rd_perc = phase.rd_perc)
+        # The last section is dumped by gem5 at exit
+        if i < len(phases) - 1:
+            m5.stats.dump()
+            m5.stats.reset()
+
+def pointArgs(run_args, point):
+    # A forked point is keyed exactly like the equivalent single run
+    mode, injection_rate, rd_perc = point
+    return dict(run_args, mode = mode, injection_rate = injection_rate,
+                rd_perc = rd_perc)
+
+def runPoint(system, options, point, params):
+    """Body of a forked child: simulate one point and exit."""
+    options.mode, injection_rate, options.rd_perc = point
+    setInjectionRate(options, injection_rate)
+    if options.cache_dir:
+        cache_key = cacheKey(pointArgs(run_args, point), params)
+        if restoreResult(options.cache_dir, cache_key, m5.options.outdir):
+            print('Reusing cached result {}'.format(cache_key))
+            sys.exit(0)
+        storeResultAtExit(options.cache_dir, cache_key, m5.options.outdir,
+                          pointArgs(run_args, point))
+    simulateTraffic(system, options)
+    markComplete()
+    sys.exit(0)
+
+def runForkedPoints(system, options, points, params):
+    """Fork one child per point from the instantiated test bench, so the
+    children share the built object graph copy-on-write."""
+    max_jobs = options.fork_jobs or len(os.sched_getaffinity(0))
+    running = {}
+    status = {}
+    def reap():
+        pid, code = os.wait()
+        status[running.pop(pid)] = os.WEXITSTATUS(code) \
+                if os.WIFEXITED(code) else -os.WTERMSIG(code)
+
+    for point in points:
+        if len(running) >= max_jobs:
+            reap()
+        subdir = pointDir('', *point)
+        os.makedirs(os.path.join(m5.options.outdir, subdir), exist_ok = True)
+        pid = m5.fork(os.path.join('%(parent)s', subdir))
+        if pid == 0:
+            runPoint(system, options, point, params)
+        running[pid] = subdir
+    while running:
+        reap()
+
+    with open(os.path.join(m5.options.outdir, 'points_status.json'),
+              'w') as f:
+        json.dump(status, f, indent = 4, sort_keys = True)
+    failed = [subdir for subdir, code in status.items() if code != 0]
+    for subdir in failed:
+        print('Point {} failed with {}'.format(subdir, status[subdir]))
+    return not failed
+
+def instantiate():
+    """m5.instantiate(), recording the Python config-build and instantiate
+    time in startup.json."""
+    startup.mark('build')
+    m5.instantiate()
+    startup.mark('instantiate')
+    startup.write(os.path.join(m5.options.outdir, 'startup.json'))
 
 options = parser.parse_args()
+if options.phases and (options.data_limit or options.steady_state):
+    fatal('--phases runs every phase for its duration, it cannot stop on '
+          'data_limit or --steady-state')
+if options.data_limit and options.steady_state:
+    fatal('data_limit and --steady-state both decide when the run stops, '
+          'use one of them')
+if options.event_queues > 1:
+    if not options.unsafe_event_queues:
+        fatal('--event-queues {} races: crossbars call into objects on '
+              'other queues without locking. Pass --unsafe-event-queues '
+              'to run it anyway'.format(options.event_queues))
+    warn('--event-queues {} is unsafe: crossbars call into objects on '
+         'other queues without locking, the run can crash or report '
+         'wrong statistics'.format(options.event_queues))
+if options.wr_perc == 'mix':
+    # A static choice from the rd_perc argument, fixed for the whole run.
+    # Forked points and phases bring their own rd_perc, which it would not
+    # match
+    if options.points or options.phases:
+        fatal('wr_perc mix picks one threshold from the rd_perc argument, '
+              'give a fixed wr_perc with --points or --phases')
+    table = loadTable(options.wr_table) if options.wr_table else None
+    options.wr_perc = mixThreshold(options.rd_perc, table)
+    print('Write threshold {} for rd_perc {}'.format(options.wr_perc,
+                                                     options.rd_perc))
+
+# A wr_perc mix run is keyed like the fixed run it resolved to
+run_args = {k: v for k, v in vars(options).items()
+            if k not in ('cache_dir', 'points', 'fork_jobs',
+                         'profile_startup', 'no_config_dump', 'wr_table',
+                         'unsafe_event_queues')}
+if options.profile_startup:
+    startup.profile()
+if options.no_config_dump:
+    m5.options.dump_config = ''
+    m5.options.json_config = ''
 
 system = TestBenchSystem(options)
 options.block_size = 64
 options.duration = int(toLatency(options.duration) * 1e12)
 options.min_addr = 0
 options.max_addr = toMemorySize(str(512 * options.num_chnls) + 'MB')
+# Each generator stops issuing once it moved its share of data_limit
+options.tgen_data_limit = int(math.ceil(options.data_limit /
+                                        float(max(1, options.num_tgens))))
 
-injection_period = int((1e12 * options.block_size) /
-                    (options.injection_rate * 1073741824))
-options.min_period = injection_period
-options.max_period = injection_period
+setInjectionRate(options, options.injection_rate)
 
 root = Root(full_system = False, system = system)
+system.writeChannelMap(os.path.join(m5.options.outdir, 'channels.json'))
+if options.event_queues > 1:
+    if options.sim_quantum == 'auto':
+        root.sim_quantum = system.getSimQuantum()
+    else:
+        root.sim_quantum = int(toLatency(options.sim_quantum) * 1e12)
 
+params = None
+if options.cache_dir:
+    params = paramFingerprint(root)
 
-m5.instantiate()
+if options.points:
+    # m5.fork() refuses to fork with listeners enabled, which gem5 leaves
+    # on by default when stdin is a terminal
+    m5.disableAllListeners()
+    instantiate()
+    if not runForkedPoints(system, options, parsePoints(options.points),
+                           params):
+        sys.exit(1)
+    sys.exit(0)
 
-if options.mode == 'LINEAR':
-    for i, tgen in enumerate(system.tgens):
-        options.min_addr = i * 64
-        tgen.start(createLinearTraffic(tgen, options))
-# elif options.mode == 'LINEAR':
-#     for tgen in system.tgens:
-#         tgen.start(createLinearTraffic(tgen, options))
-elif options.mode == 'RANDOM':
-    for tgen in system.tgens:
-        tgen.start(createRandomTraffic(tgen, options))
-else:
-    print('Traffic type not supported!')
+if options.cache_dir:
+    cache_key = cacheKey(run_args, params)
+    if restoreResult(options.cache_dir, cache_key, m5.options.outdir):
+        print('Reusing cached result {}'.format(cache_key))
+        sys.exit(0)
+    storeResultAtExit(options.cache_dir, cache_key, m5.options.outdir,
+                      run_args)
+
+instantiate()
 
-exit_event = m5.simulate()
+if options.phases:
+    runPhases(system, options, parsePhases(options.phases, options))
+else:
+    simulateTraffic(system, options)
+markComplete()
 # simstat = loader.get_simstat(root)
 # with open('test.json', 'w') as f:
-#     simstat.dump(f)
\ No newline at end of file
+#     simstat.dump(f)
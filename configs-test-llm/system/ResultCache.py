@@ -0,0 +1,123 @@
+import m5
+from m5.defines import buildEnv
+
+import atexit
+import hashlib
+import json
+import os
+import shutil
+
+# A run is identified by the arguments it was started with, the parameters
+# of every SimObject the config script built from them, the config scripts
+# themselves and the gem5 binary that simulates them. If all of them match,
+# the stats it produces match too.
+
+def binaryIdentity():
+    exe = os.path.realpath('/proc/self/exe')
+    st = os.stat(exe)
+    return {'path': exe,
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns,
+            'build': sorted((k, str(v)) for k, v in buildEnv.items())}
+
+_CONFIG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_REPO_DIR = os.path.dirname(_CONFIG_DIR)
+# The test bench config and the packages it imports. Their code decides
+# what runs after instantiate, e.g. the traffic phases and when to stop,
+# which the parameters do not capture.
+_SOURCE_DIRS = [_CONFIG_DIR,
+                os.path.join(_REPO_DIR, 'harness'),
+                os.path.join(_REPO_DIR, 'memsys')]
+
+def sourceDigest():
+    digest = hashlib.sha256()
+    for top in _SOURCE_DIRS:
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames[:] = sorted(d for d in dirnames if d != '__pycache__')
+            for name in sorted(filenames):
+                if not name.endswith('.py'):
+                    continue
+                path = os.path.join(dirpath, name)
+                digest.update(os.path.relpath(path, _REPO_DIR).encode())
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+def _peers(port_ref):
+    return [str(ref.peer) for ref in getattr(port_ref, 'elements', [port_ref])]
+
+def paramFingerprint(root):
+    lines = []
+    for obj in sorted(root.descendants(), key = lambda o: o.path()):
+        lines.append('[{}] {}'.format(obj.path(), obj.type))
+        for name in sorted(obj._values):
+            lines.append('{}={}'.format(name, obj._values[name]))
+        for name in sorted(obj._port_refs):
+            lines.append('{}->{}'.format(name,
+                                         _peers(obj._port_refs[name])))
+    return hashlib.sha256('\n'.join(lines).encode()).hexdigest()
+
+def cacheKey(run_args, params):
+    """params is the paramFingerprint of the Root, taken before
+    m5.instantiate resolves the proxies."""
+    key = {'args': run_args,
+           'params': params,
+           'sources': sourceDigest(),
+           'binary': binaryIdentity()}
+    text = json.dumps(key, sort_keys = True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def _entry(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], key)
+
+# Files of a finished run that are kept next to its stats.txt
+_EXTRA_FILES = ['sections.json', 'steady_state.json', 'completion.json']
+
+def restoreResult(cache_dir, key, outdir):
+    """Copy a cached stats.txt to outdir. Returns False on a cache miss."""
+    entry = _entry(cache_dir, key)
+    if not os.path.isfile(os.path.join(entry, 'stats.txt')):
+        return False
+    shutil.copyfile(os.path.join(entry, 'stats.txt'),
+                    os.path.join(outdir, m5.options.stats_file))
+    for name in _EXTRA_FILES:
+        if os.path.isfile(os.path.join(entry, name)):
+            shutil.copyfile(os.path.join(entry, name),
+                            os.path.join(outdir, name))
+    with open(os.path.join(outdir, 'cache_key'), 'w') as f:
+        f.write('{} hit\n'.format(key))
+    return True
+
+_completed = []
+
+def markComplete():
+    """Only runs whose simulation returned normally are cached."""
+    _completed.append(True)
+
+def storeResult(cache_dir, key, outdir, run_args):
+    if not _completed:
+        return
+    stats = os.path.join(outdir, m5.options.stats_file)
+    if not os.path.isfile(stats) or os.path.getsize(stats) == 0:
+        return
+    entry = _entry(cache_dir, key)
+    os.makedirs(entry, exist_ok = True)
+    for name in _EXTRA_FILES:
+        if os.path.isfile(os.path.join(outdir, name)):
+            shutil.copyfile(os.path.join(outdir, name),
+                            os.path.join(entry, name))
+    # Copy then rename so concurrent sweeps never see a partial stats.txt
+    tmp = os.path.join(entry, 'stats.txt.{}'.format(os.getpid()))
+    shutil.copyfile(stats, tmp)
+    os.rename(tmp, os.path.join(entry, 'stats.txt'))
+    with open(os.path.join(entry, 'args.json'), 'w') as f:
+        json.dump(run_args, f, indent = 4, sort_keys = True)
+
+def storeResultAtExit(cache_dir, key, outdir, run_args):
+    """Store the final stats once gem5 has dumped them at exit.
+    Must be registered before the first m5.simulate(): atexit handlers run
+    in reverse order and gem5 registers its stats dump there.
+    """
+    with open(os.path.join(outdir, 'cache_key'), 'w') as f:
+        f.write('{} miss\n'.format(key))
+    atexit.register(storeResult, cache_dir, key, outdir, run_args)
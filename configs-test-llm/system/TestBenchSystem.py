@@ -4,34 +4,53 @@ from __future__ import absolute_import
 import m5
 from m5.objects import *
 from common import ObjectList
-
-import math
+from m5.util.convert import toFrequency
+from memsys.backends import channelGroups, connectScheds, getBackend, \
+                            writeChannelPaths
+from memsys.interleave import regionSize, regions
 
 class TestBenchSystem(System):
 
+    _clock = '4GHz'
+
     def __init__(self, options):
         super(TestBenchSystem, self).__init__()
-        if options.mem_type == 'LLM':
-            self._mem_type = LLM2
-            self._addr_mapping = 'RoCoRaBaCh'
+        self._backend = getBackend(options.mem_type)
+        if self._backend.per_bank:
             self._paging_policy = options.paging_policy
             self._unified_queue = options.unified_queue
             self._wr_perc = options.wr_perc
             self._bank_per_channel = options.banks_per_channel
-        elif options.mem_type == 'HBM':
-            self._mem_type = HBM_1000_4H_1x128
-            self._addr_mapping = HBM_1000_4H_1x128.addr_mapping
-            self._paging_policy = HBM_1000_4H_1x128.page_policy
+            self._interconnect = options.interconnect
+            self._bank_mapping = options.bank_mapping
         else:
-            fatal('Memory type not supported.')
+            self._bank_per_channel = 1
         self._num_chnls = options.num_chnls
         self._num_tgens = options.num_tgens
+        # None keeps the backend's, the cache line or a row for RoRaBaChCo
+        self._intlv_size = options.intlv_size
+        self._xor_low_bit = options.xor_low_bit
+        # Buffer sizes given on the command line override the backend's
+        self._sched_buffers = {}
+        for name, value in (('read_buffer_size', options.sched_read_buffer),
+                            ('write_buffer_size', options.sched_write_buffer),
+                            ('resp_buffer_size', options.sched_resp_buffer)):
+            if value is not None:
+                self._sched_buffers[name] = value
+        if self._sched_buffers and not self._backend.per_bank:
+            fatal('{} has no MemSchedulers for --sched-*-buffer to '
+                  'size'.format(options.mem_type))
+        self._bank_buffers = {}
+        for name, value in (('read_buffer_size', options.bank_read_buffer),
+                            ('write_buffer_size', options.bank_write_buffer)):
+            if value is not None:
+                self._bank_buffers[name] = value
 
         self._mem_size = str(512 * options.num_chnls) + 'MB'
         self._addr_range = AddrRange(self._mem_size)
 
         self.clk_domain = SrcClockDomain()
-        self.clk_domain.clock = '4GHz'
+        self.clk_domain.clock = self._clock
         self.clk_domain.voltage_domain = VoltageDomain()
         self.cache_line_size = 64
 
@@ -42,6 +61,8 @@ class TestBenchSystem(System):
         self.tgens = [PyTrafficGen() for i in range(self._num_tgens)]
         self.createMemoryCtrl()
         self.connectComponents()
+        if options.event_queues > 1:
+            self.createEventQueues(options.event_queues)
         ####
         # self.membuses = [SystemXBar(width = 64, max_routing_table_size = 16777216) for i in range(self._num_tgens)]
         # self.scheds = [MemScheduler(resp_buffer_size = 64) for i in range(self._num_chnls)]
@@ -59,94 +80,153 @@ class TestBenchSystem(System):
 
         # self.system_port = self.membuses[0].slave
 
-    def createMemoryCtrl(self):
-        mem_ctrls = []
-        bpc = 0
-        cls = self._mem_type
-        addr_range = self._addr_range
-        addr_map = self._addr_mapping
-        page_policy = self._paging_policy
-        if self._mem_type == LLM2:
-            bpc = self._bank_per_channel
-            num_chnls = self._num_chnls * bpc
-        elif self._mem_type == HBM_1000_4H_1x128:
-            num_chnls = self._num_chnls
+    def connectPrivateXBars(self):
+        # One crossbar per traffic generator with a link to every scheduler
+        self.membuses = [SystemXBar(width = 64, max_routing_table_size = 16777216) for i in range(self._num_tgens)]
+        for i, tgen in enumerate(self.tgens):
+            tgen.port = self.membuses[i].cpu_side_ports
+
+        for i, membus in enumerate(self.membuses):
+            for sched in self.scheds:
+                sched.cpu_side[i] = membus.mem_side_ports
+
+    def connectSharedXBar(self):
+        """
+        One non-coherent crossbar between all traffic generators and all
+        schedulers, so requests to the same channel contend for its port
+        explicitly. As a router it only steers packets by address: it adds
+        no latency, and contention is left to the schedulers' queues and
+        the one-packet-per-cycle port to each of them.
+        """
+        self.membuses = NoncoherentXBar(width = 64)
+        if self._interconnect == 'router':
+            self.membuses.frontend_latency = 0
+            self.membuses.forward_latency = 0
+            self.membuses.response_latency = 0
         else:
-            fatal('Memory type not supported.')
-
-        intlv_size = self.cache_line_size
-        if addr_map == 'RoRaBaChCo':
-            rowbuffer_size = cls.device_rowbuffer_size.value * \
-                            cls.devices_per_rank.value
-            intlv_low_bit = int(math.log(rowbuffer_size, 2))
+            # The latencies of the private SystemXBars
+            self.membuses.frontend_latency = 3
+            self.membuses.forward_latency = 4
+            self.membuses.response_latency = 2
+        for tgen in self.tgens:
+            tgen.port = self.membuses.cpu_side_ports
+        for sched in self.scheds:
+            sched.cpu_side = self.membuses.mem_side_ports
+
+    def createEventQueues(self, num_queues):
+        """
+        Experimental: spread the test bench over num_queues host threads.
+        The queues are only cut where a crossbar adds latency between them:
+        every channel, i.e. a MemScheduler with its banks, is a unit, and so
+        is every traffic generator with its private crossbar. Per-channel
+        memories keep the generators and their crossbar on queue 0 and deal
+        out the controllers. The units are dealt round robin to the queues.
+        A crossbar still calls the port of an object on another queue from
+        its own thread, which gem5 does not lock. This is a data race, so
+        run_llm_eval.py only builds it with --unsafe-event-queues.
+        """
+        if self._backend.per_bank and self._interconnect != 'private':
+            fatal('--event-queues needs --interconnect private, the {} '
+                  'crossbar has no latency to cut the queues at'.format(
+                  self._interconnect))
+        units = []
+        if self._backend.per_bank:
+            groups = channelGroups(self.mem_ctrls, self.scheds,
+                                   self._bank_mapping)
+            for sched, (ctrls, port) in zip(self.scheds, groups):
+                units.append([sched] + ctrls)
+            for tgen, membus in zip(self.tgens, self.membuses):
+                units.append([tgen, membus])
         else:
-            intlv_low_bit = int(math.log(intlv_size, 2))
-        intlv_bits = intlv_bits = int(math.log(num_chnls, 2))
-
-        for chnl in range(num_chnls):
-            interface = cls()
-            interface.range = AddrRange(addr_range.start, size = addr_range.size(),
-                        intlvHighBit = intlv_low_bit + intlv_bits - 1,
-                        xorHighBit = 0,
-                        intlvBits = intlv_bits,
-                        intlvMatch = chnl)
-            
-            # interface.read_buffer_size = 32
-            # interface.write_buffer_size = 16
-
-            ctrl = MemCtrl()
-            ctrl.dram = interface
-
-            ctrl.dram.null = True
-            ctrl.dram.addr_mapping = addr_map
-            ctrl.dram.page_policy = page_policy
-
-            mem_ctrls.append(ctrl)
-            if self._mem_type == LLM2:
-                interface.device_size = str(int(512 / bpc)) + 'MB'
-                ctrl.dram.read_buffer_size = 2
-                ctrl.dram.write_buffer_size = 8
-                ctrl.dram.page_policy = page_policy
-                ctrl.write_high_thresh_perc = 100 
-                ctrl.write_low_thresh_perc = 90
-                ctrl.min_writes_per_switch = 1
-                ctrl.mem_sched_policy = 'fcfs'
+            units = [self.tgens + [self.membuses]] + \
+                    [[ctrl] for ctrl in self.mem_ctrls]
+        for i, unit in enumerate(units):
+            for obj in unit:
+                obj.eventq_index = i % num_queues
+
+    def _cutXBars(self):
+        """Crossbars between objects on different event queues."""
+        if self._backend.per_bank:
+            return list(self.membuses)
+        return [self.membuses]
+
+    def getSimQuantum(self):
+        """
+        Largest safe quantum for createEventQueues: the shortest latency a
+        packet takes across a cut, i.e. the forward path of a crossbar for
+        requests and its response path for responses, in system cycles.
+        """
+        cycles = min(min(xbar.frontend_latency.value +
+                         xbar.forward_latency.value,
+                         xbar.response_latency.value)
+                     for xbar in self._cutXBars())
+        return cycles * int(1e12 / toFrequency(self._clock))
+
+    def linearStart(self, i):
+        """
+        Offset of the first address of the i-th LINEAR generator. They
+        start a block apart and, when the number of banks or channels is
+        not a power of two, take turns between the contiguous regions
+        interleaveRanges splits the range into, so all targets are busy.
+        """
+        num_int = self._backend.numTargets(self._num_chnls,
+                                           self._bank_per_channel)
+        num_regions = regions(num_int)
+        region_size = regionSize(self._addr_range.size(), num_int,
+                                 self._intlv_size or
+                                 self._backend.defaultIntlvSize())
+        return (i % num_regions) * region_size + (i // num_regions) * 64
+
+    def writeChannelMap(self, path):
+        """channels.json for harness.balance, once the system has a Root."""
+        if self._backend.per_bank:
+            writeChannelPaths(path, self.mem_ctrls, self.scheds,
+                              self._bank_mapping)
+        else:
+            writeChannelPaths(path, self.mem_ctrls, [])
 
+    def createMemoryCtrl(self):
+        params = dict(self._bank_buffers, null = True)
+        ctrl_params = {}
+        if self._backend.per_bank:
+            params['page_policy'] = self._paging_policy
+            ctrl_params['mem_sched_policy'] = 'fcfs'
+        self.mem_ctrls = self._backend.createCtrls(self._addr_range,
+                                self._num_chnls, self._bank_per_channel,
+                                self._intlv_size, self._xor_low_bit,
+                                ctrl_params, **params)
 
-        self.mem_ctrls = mem_ctrls
     def connectComponents(self):
 
-        if self._mem_type == LLM2:
-            self.membuses = [SystemXBar(width = 64, max_routing_table_size = 16777216) for i in range(self._num_tgens)]
-            self.scheds = [MemScheduler(read_buffer_size = 1, write_buffer_size = 32, resp_buffer_size = 64, unified_queue = self._unified_queue, \
-                            service_write_threshold = self._wr_perc) for i in range(self._num_chnls)]
+        if self._backend.per_bank:
+            self.scheds = self._backend.createScheds(self._num_chnls,
+                                unified_queue = self._unified_queue,
+                                service_write_threshold = self._wr_perc,
+                                **self._sched_buffers)
 
-            bpc = self._bank_per_channel
-            for i, tgen in enumerate(self.tgens):
-                tgen.port = self.membuses[i].cpu_side_ports
-
-            for i, membus in enumerate(self.membuses):
-                for sched in self.scheds:
-                    sched.cpu_side[i] = membus.mem_side_ports
+            if self._interconnect == 'private':
+                self.connectPrivateXBars()
+            elif self._interconnect in ('shared', 'router'):
+                self.connectSharedXBar()
+            else:
+                fatal('Interconnect {} not supported.'.format(
+                      self._interconnect))
 
             # for i in range(self._num_chnls):
             #     for j in range(i * bpc, (i + 1) * bpc):
             #         self.scheds[i].mem_side[j -  i * bpc] = self.mem_ctrls[j].port
             
-            for i, mem_ctrl in enumerate(self.mem_ctrls):
-                self.scheds[i % self._num_chnls].mem_side = mem_ctrl.port
+            connectScheds(self.scheds, self.mem_ctrls, self._bank_mapping)
 
 
             self.system_port = self.membuses[0].cpu_side_ports
-        elif self._mem_type == HBM_1000_4H_1x128:
+        else:
             self.membuses = SystemXBar(width = 64, max_routing_table_size = 16777216)
             for tgen in self.tgens:
                 tgen.port = self.membuses.cpu_side_ports
             for mem_ctrl in self.mem_ctrls:
                 self.membuses.mem_side_ports = mem_ctrl.port
             self.system_port = self.membuses[0].cpu_side_ports
-        else:
-            fatal('Memory type not supported.')
 
 
 
@@ -5,7 +5,8 @@ def createLinearTraffic(tgen, tgen_options):
                             tgen_options.block_size,
                             tgen_options.min_period,
                             tgen_options.max_period,
-                            tgen_options.rd_perc, 0)
+                            tgen_options.rd_perc,
+                            tgen_options.tgen_data_limit)
     yield tgen.createExit(0)
 
 def createRandomTraffic(tgen, tgen_options):
@@ -15,7 +16,8 @@ def createRandomTraffic(tgen, tgen_options):
                             tgen_options.block_size,
                             tgen_options.min_period,
                             tgen_options.max_period,
-                            tgen_options.rd_perc, 0)
+                            tgen_options.rd_perc,
+                            tgen_options.tgen_data_limit)
     yield tgen.createExit(0)
 
 def createStridedTraffic(tgen, tgen_options):
@@ -30,4 +32,28 @@ def createStridedTraffic(tgen, tgen_options):
                                 tgen_options.min_period,
                                 tgen_options.max_period,
                                 tgen_options.rd_perc, 0)
-    yield tgen.createExit(0)
\ No newline at end of file
+    yield tgen.createExit(0)
+def createPhasedTraffic(tgen, phases, drain, offset = 0):
+    # One state per phase, each followed by drain ticks of idling so the
+    # requests of a phase complete before the next phase starts. LINEAR
+    # phases start offset bytes into the range like createLinearTraffic.
+    for phase in phases:
+        if phase.mode == 'LINEAR':
+            yield tgen.createLinear(phase.duration,
+                                    phase.min_addr + offset,
+                                    phase.max_addr,
+                                    phase.block_size,
+                                    phase.min_period,
+                                    phase.max_period,
+                                    phase.rd_perc, 0)
+        elif phase.mode == 'RANDOM':
+            yield tgen.createRandom(phase.duration,
+                                    phase.min_addr,
+                                    phase.max_addr,
+                                    phase.block_size,
+                                    phase.min_period,
+                                    phase.max_period,
+                                    phase.rd_perc, 0)
+        if drain:
+            yield tgen.createIdle(drain)
+    yield tgen.createExit(0)
@@ -0,0 +1,6 @@
+""" Host-side helpers for driving gem5 runs of the LLM and HBM configs.
+
+The modules in this package are plain Python and do not import m5, so they
+can be used both from the run_*.py drivers at the top of the repository and
+from inside the gem5 config scripts (after addToPath('..')).
+"""
@@ -0,0 +1,62 @@
+""" Share of the memory requests that reaches each channel.
+
+run_llm_eval.py and run_gapbs.py write channels.json next to stats.txt:
+the channel (MemScheduler, or controller for per-channel memories) of every
+memory controller. A channel's requests are the readReqs and writeReqs of
+its controllers. The imbalance is the largest share times the number of
+channels: 1 when every channel gets the same share, up to the number of
+channels when one gets everything.
+Usage:
+    python3 -m harness.balance (outdir)
+"""
+
+import argparse
+import json
+import os
+
+from harness.stats import lastSection, loadSections
+
+
+def loadChannels(path):
+    with open(path) as f:
+        return json.load(f)
+
+def channelShares(stats, channels):
+    num_chnls = max(channels.values()) + 1
+    reads = [0.0] * num_chnls
+    writes = [0.0] * num_chnls
+    for ctrl, chnl in channels.items():
+        reads[chnl] += stats.get(ctrl + '.readReqs', 0.0)
+        writes[chnl] += stats.get(ctrl + '.writeReqs', 0.0)
+    total = sum(reads) + sum(writes)
+    shares = [(r + w) / total if total else 0.0
+              for r, w in zip(reads, writes)]
+    return {'reads': reads,
+            'writes': writes,
+            'shares': shares,
+            'imbalance': max(shares) * num_chnls}
+
+def runShares(outdir, channels = None):
+    """[(label, channelShares)] of every stats section of a run, or of the
+    last one if the run did not label its sections."""
+    channels = loadChannels(channels or
+                            os.path.join(outdir, 'channels.json'))
+    if os.path.isfile(os.path.join(outdir, 'sections.json')):
+        return [(info['label'], channelShares(stats, channels))
+                for info, stats in loadSections(outdir)]
+    stats = lastSection(os.path.join(outdir, 'stats.txt'))
+    return [('final', channelShares(stats, channels))]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description =
+                        'Request share of every memory channel of a run')
+    parser.add_argument('outdir', type = str)
+    parser.add_argument('--channels', type = str, default = None,
+                        help = 'channels.json to use, e.g. the one of the '
+                        'parent of forked points')
+    args = parser.parse_args()
+    for label, result in runShares(args.outdir, args.channels):
+        print('{}: imbalance {:.3f}'.format(label, result['imbalance']))
+        for i, share in enumerate(result['shares']):
+            print('  channel {:<3} {:6.2%}  {:>12g} reads {:>12g} writes'
+                  .format(i, share, result['reads'][i], result['writes'][i]))
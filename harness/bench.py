@@ -0,0 +1,122 @@
+""" Host-performance benchmarks of gem5 on the LLM configurations.
+
+A fixed matrix of short run_llm_eval.py runs and optionally one GAPBS ROI,
+each measured by its host time, tick rate and memory and by the startup
+phases in startup.json. Results are compared against a stored baseline
+from the same host.
+"""
+
+import json
+import os
+import socket
+
+from .matrix import GAPBS_SCRIPT, gem5Cmd, llmEvalJob
+from .pool import Job
+from .stats import hostMetrics, lastSection, loadSections
+
+
+# name -> run_llm_eval.py arguments up to num_tgens
+BENCH_LLM_CONFIGS = [
+    ('LLM_1x32', ['LLM', '1', '32', '0', '60', 'close', '16']),
+    ('LLM_4x64', ['LLM', '4', '64', '0', '60', 'close', '16']),
+    ('LLM_16x32', ['LLM', '16', '32', '0', '60', 'close', '16']),
+    ('LLM_16x64', ['LLM', '16', '64', '0', '60', 'close', '16']),
+    ('HBM_1', ['HBM', '1', '0', '0', '60', 'open', '16']),
+    ('HBM_16', ['HBM', '16', '0', '0', '60', 'open', '16']),
+]
+BENCH_TRAFFICS = ['LINEAR', 'RANDOM']
+BENCH_BW = 8
+BENCH_RD_PERC = 60
+BENCH_DURATION = '5us'
+
+# metric -> True if higher is better
+BENCH_METRICS = {
+    'host_seconds': False,
+    'host_tick_rate': True,
+    'host_mem_usage': False,
+    'build_seconds': False,
+    'instantiate_seconds': False,
+}
+# Differences below this are timer noise, whatever the ratio
+_SLACK = {'host_seconds': 0.1, 'build_seconds': 0.1,
+          'instantiate_seconds': 0.1}
+
+def llmBenchJobs(gem5, results):
+    jobs = []
+    for name, config_args in BENCH_LLM_CONFIGS:
+        for traffic in BENCH_TRAFFICS:
+            label = '{}_{}'.format(name, traffic)
+            jobs.append(llmEvalJob(gem5, os.path.join(results, label),
+                                   config_args, traffic, BENCH_DURATION,
+                                   BENCH_BW, BENCH_RD_PERC, name = label))
+    return jobs
+
+def _fsBenchArgs(kernel, disk, checkpoint_dir):
+    return [kernel, disk, 'simple', 1, 'classic', 1, 'bfs', 1, 10,
+            '--checkpoint-dir', checkpoint_dir, '--roi-checkpoint']
+
+def fsCheckpointJob(gem5, results, kernel, disk, checkpoint_dir):
+    """Unmeasured run of the FS benchmark that creates its boot and ROI
+    checkpoints, or finds them, so the measured run always restores."""
+    outdir = os.path.join(results, 'FS_bfs_g10_checkpoint')
+    return Job('FS_bfs_g10_checkpoint',
+               gem5Cmd(gem5, outdir, GAPBS_SCRIPT,
+                       _fsBenchArgs(kernel, disk, checkpoint_dir)),
+               outdir)
+
+def fsBenchJob(gem5, results, kernel, disk, checkpoint_dir):
+    """bfs on a 2^10 vertex graph, restored from the ROI checkpoint of
+    fsCheckpointJob so it skips boot and graph generation."""
+    outdir = os.path.join(results, 'FS_bfs_g10')
+    return Job('FS_bfs_g10', gem5Cmd(gem5, outdir, GAPBS_SCRIPT,
+                                     _fsBenchArgs(kernel, disk,
+                                                  checkpoint_dir)),
+               outdir)
+
+def _startup(outdir):
+    with open(os.path.join(outdir, 'startup.json')) as f:
+        phases = json.load(f)['phases']
+    return {'build_seconds': phases.get('build', 0.0),
+            'instantiate_seconds': phases.get('instantiate', 0.0)}
+
+def benchMetrics(job):
+    """Metrics of a finished benchmark job, None if it failed. FS runs are
+    measured over their ROI section only."""
+    stats_file = os.path.join(job.outdir, 'stats.txt')
+    if job.returncode != 0 or not os.path.isfile(stats_file):
+        return None
+    if os.path.isfile(os.path.join(job.outdir, 'sections.json')):
+        stats = loadSections(job.outdir)[0][1]
+    else:
+        stats = lastSection(stats_file)
+    return dict(hostMetrics(stats), **_startup(job.outdir))
+
+def writeBaseline(path, results):
+    with open(path, 'w') as f:
+        json.dump({'host': socket.gethostname(), 'runs': results}, f,
+                  indent = 4, sort_keys = True)
+
+def loadBaseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare(results, baseline, threshold):
+    """[(run, metric, value, baseline value, ok)] for every metric that has
+    a baseline. A metric fails once it is worse than its baseline by more
+    than threshold (relative)."""
+    rows = []
+    for run in sorted(results):
+        base_run = baseline['runs'].get(run)
+        if not base_run or results[run] is None:
+            continue
+        for metric, higher_better in sorted(BENCH_METRICS.items()):
+            if metric not in base_run:
+                continue
+            value, base = results[run][metric], base_run[metric]
+            if higher_better:
+                ok = value >= base / (1 + threshold)
+            else:
+                ok = value <= base * (1 + threshold) or \
+                     value - base <= _SLACK.get(metric, 0.0)
+            rows.append((run, metric, value, base, ok))
+    return rows
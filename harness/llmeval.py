@@ -0,0 +1,50 @@
+""" Running a batch of run_llm_eval.py points and collecting their metrics. """
+
+import os
+
+from .matrix import llmEvalJob
+from .stats import lastSection, llmEvalMetrics
+
+
+def runJobs(pool, jobs, metrics = llmEvalMetrics):
+    """Run the {key: Job} dict on the pool. Returns {key: metrics of the
+    last stats section}, with None for jobs whose gem5 run failed.
+    """
+    pool.run(list(jobs.values()))
+    results = {}
+    for key, job in jobs.items():
+        stats_file = os.path.join(job.outdir, 'stats.txt')
+        if job.returncode != 0 or not os.path.isfile(stats_file):
+            results[key] = None
+            continue
+        results[key] = metrics(lastSection(stats_file))
+    return results
+
+def runPoints(pool, gem5, outroot, config_args, points, duration = '10us',
+              extra = ()):
+    """Simulate every (traffic, injection_rate, rd_perc) point of one
+    test-bench configuration on the pool. Returns {point: metrics}, with
+    None for points whose gem5 run failed.
+    """
+    jobs = {}
+    for point in points:
+        traffic, bw, rd_perc = point
+        jobs[point] = llmEvalJob(gem5, outroot, config_args, traffic,
+                                 duration, bw, rd_perc, extra = extra)
+    return runJobs(pool, jobs)
+
+def runVariants(pool, gem5, outroot, config_args, point, variants,
+                duration = '10us', extra = ()):
+    """Simulate one (traffic, injection_rate, rd_perc) point once per
+    variant, a {label: extra arguments} dict, each under outroot/label.
+    Returns {label: metrics}, with None for failed runs.
+    """
+    traffic, bw, rd_perc = point
+    jobs = {}
+    for label, args in variants.items():
+        jobs[label] = llmEvalJob(gem5, os.path.join(outroot, label),
+                                 config_args, traffic, duration, bw, rd_perc,
+                                 extra = list(extra) + list(args),
+                                 name = '{}/{}/BW_{:g}/RD_{}'.format(
+                                    label, traffic, bw, rd_perc))
+    return runJobs(pool, jobs)
@@ -0,0 +1,132 @@
+""" Job matrices for the sweeps that run.sh and run-fs.sh used to fan out. """
+
+import os
+
+from .pool import Job
+
+
+LLM_EVAL_SCRIPT = 'configs-test-llm/run_llm_eval.py'
+GAPBS_SCRIPT = 'configs-llm-fs/run_gapbs.py'
+
+# name -> (mem_type, num_chnls, banks_per_channel, unified_queue, wr_perc,
+#          paging_policy, num_tgens), the configurations swept by run.sh
+LLM_EVAL_CONFIGS = [
+    ('LLM_32', ['LLM', '2', '32', '0', '60', 'close', '16']),
+    ('LLM_64', ['LLM', '2', '64', '0', '60', 'close', '16']),
+    ('HBM', ['HBM', '8', '0', '0', '60', 'open', '16']),
+]
+
+def parseRange(text, cast = int):
+    """Parse '1:20', '1:20:2' or '0,40,50' into a list."""
+    if ':' in text:
+        parts = [cast(p) for p in text.split(':')]
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) > 2 else 1
+        values = []
+        while start <= stop:
+            values.append(start)
+            start += step
+        return values
+    return [cast(p) for p in text.split(',')]
+
+def gem5Cmd(gem5, outdir, script, args):
+    return [gem5, '--outdir={}'.format(outdir), '-re', script] + \
+            [str(arg) for arg in args]
+
+def llmEvalArgs(config_args, traffic, duration, bw, rd_perc, data_limit = 0):
+    return config_args + [traffic, duration, bw, rd_perc, data_limit]
+
+def pointDir(outroot, traffic, bw, rd_perc):
+    return os.path.join(outroot, 'MODE_{}'.format(traffic),
+                        'BW_{:g}'.format(bw), 'RD_{}'.format(rd_perc))
+
+def llmEvalJob(gem5, outroot, config_args, traffic, duration, bw, rd_perc,
+               extra = (), name = None, weight = 1, cpus = 1):
+    outdir = pointDir(outroot, traffic, bw, rd_perc)
+    args = llmEvalArgs(config_args, traffic, duration, bw, rd_perc) + \
+            list(extra)
+    name = name or '{}/BW_{:g}/RD_{}'.format(traffic, bw, rd_perc)
+    return Job(name, gem5Cmd(gem5, outdir, LLM_EVAL_SCRIPT, args), outdir,
+               cpus = cpus, weight = weight)
+
+def llmEvalJobs(gem5, results, bws, traffics, rd_percs,
+                configs = LLM_EVAL_CONFIGS, duration = '10us', extra = ()):
+    """One job per (config, traffic, bandwidth, read percentage), laid out
+    as results/<config>/MODE_<traffic>/BW_<bw>/RD_<rd_perc> like run.sh.
+    """
+    jobs = []
+    for name, config_args in configs:
+        # The number of memory controllers dominates the run time
+        num_ctrls = int(config_args[1]) * max(1, int(config_args[2]))
+        for traffic in traffics:
+            for bw in bws:
+                for rd_perc in rd_percs:
+                    jobs.append(llmEvalJob(gem5, os.path.join(results, name),
+                                config_args, traffic, duration, bw, rd_perc,
+                                extra = extra,
+                                name = '{}/{}/BW_{:g}/RD_{}'.format(
+                                    name, traffic, bw, rd_perc),
+                                weight = num_ctrls * bw))
+    return jobs
+
+def llmEvalForkJobs(gem5, results, bws, traffics, rd_percs, fork_jobs,
+                    configs = LLM_EVAL_CONFIGS, duration = '10us',
+                    extra = ()):
+    """One job per config that instantiates the test bench once and forks
+    a child per (traffic, bandwidth, read percentage) point, with the same
+    directory layout as llmEvalJobs.
+    """
+    jobs = []
+    for name, config_args in configs:
+        num_ctrls = int(config_args[1]) * max(1, int(config_args[2]))
+        points = ['{}:{:g}:{}'.format(traffic, bw, rd_perc)
+                  for traffic in traffics
+                  for bw in bws
+                  for rd_perc in rd_percs]
+        outdir = os.path.join(results, name)
+        args = llmEvalArgs(config_args, traffics[0], duration, bws[0],
+                           rd_percs[0]) + \
+                ['--points', ','.join(points), '--fork-jobs', fork_jobs] + \
+                list(extra)
+        jobs.append(Job(name, gem5Cmd(gem5, outdir, LLM_EVAL_SCRIPT, args),
+                        outdir, cpus = fork_jobs,
+                        weight = num_ctrls * sum(bws)))
+    return jobs
+
+def gapbsJobs(gem5, results, kernel, disk, apps, sizes, cpu_type = 'simple',
+              num_cpus = 1, mem_sys = 'classic', channels = 1, synthetic = 1,
+              extra = ()):
+    """One job per (app, graph size), laid out as
+    results/Size_<size>/App_<app> like run-fs.sh.
+    """
+    jobs = []
+    for app in apps:
+        for size in sizes:
+            outdir = os.path.join(results, 'Size_{}'.format(size),
+                                  'App_{}'.format(app))
+            args = [kernel, disk, cpu_type, num_cpus, mem_sys, channels,
+                    app, synthetic, size] + list(extra)
+            # KVM runs one host thread per vCPU
+            jobs.append(Job('{}/{}'.format(app, size),
+                            gem5Cmd(gem5, outdir, GAPBS_SCRIPT, args),
+                            outdir, cpus = num_cpus,
+                            weight = 2 ** int(size) if synthetic else 1))
+    return jobs
+
+def gapbsBatchJob(gem5, results, kernel, disk, apps, sizes,
+                  cpu_type = 'simple', num_cpus = 1, mem_sys = 'classic',
+                  channels = 1, synthetic = 1, extra = ()):
+    """A single job that boots once and runs every (app, graph size) back
+    to back, see run_gapbs.py --jobs. Its stats.txt has one section per
+    ROI, labelled in results/Batch/sections.json.
+    """
+    batch = [(app, size) for app in apps for size in sizes]
+    outdir = os.path.join(results, 'Batch')
+    first_app, first_size = batch[0]
+    args = [kernel, disk, cpu_type, num_cpus, mem_sys, channels,
+            first_app, synthetic, first_size] + list(extra)
+    if len(batch) > 1:
+        args += ['--jobs', ','.join('{}:{}'.format(app, size)
+                                    for app, size in batch[1:])]
+    return [Job('batch', gem5Cmd(gem5, outdir, GAPBS_SCRIPT, args), outdir,
+                cpus = num_cpus)]
@@ -0,0 +1,161 @@
+""" Bounded worker pool for running many gem5 processes on one host.
+
+Every job is started with its own set of pinned host cores and the number of
+concurrent jobs is capped by both the number of usable cores and the amount
+of available memory, so a sweep never oversubscribes the machine.
+"""
+
+import json
+import os
+import subprocess
+import time
+
+
+_SIZE_UNITS = {'B': 1, 'kB': 2 ** 10, 'KB': 2 ** 10, 'MB': 2 ** 20,
+               'GB': 2 ** 30, 'TB': 2 ** 40}
+
+def toBytes(size):
+    """Convert a size string such as '512MB' or '2GB' to bytes."""
+    size = str(size).strip()
+    for unit in sorted(_SIZE_UNITS, key = len, reverse = True):
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * _SIZE_UNITS[unit])
+    return int(size)
+
+def availableCpus():
+    """Host cores this process is allowed to run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def availableMemory():
+    """Memory in bytes that can be used without swapping."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except IOError:
+        pass
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+
+def defaultWorkers(mem_per_job, cpus_per_job = 1):
+    """Number of jobs that fit on this host at the same time."""
+    by_cpu = len(availableCpus()) // cpus_per_job
+    by_mem = availableMemory() // toBytes(mem_per_job)
+    return max(1, min(by_cpu, by_mem))
+
+
+class Job(object):
+    """One gem5 invocation.
+
+    cmd is the full argument vector, outdir the gem5 output directory (also
+    used for the launcher log and exit status), cpus the number of host cores
+    the job needs and weight a relative cost estimate used for ordering.
+    """
+
+    def __init__(self, name, cmd, outdir, cpus = 1, weight = 1):
+        self.name = name
+        self.cmd = cmd
+        self.outdir = outdir
+        self.cpus = cpus
+        self.weight = weight
+        self.returncode = None
+        self.seconds = None
+        self.host_cpus = []
+
+    def status(self):
+        return {'name': self.name,
+                'cmd': self.cmd,
+                'outdir': self.outdir,
+                'returncode': self.returncode,
+                'seconds': self.seconds,
+                'host_cpus': self.host_cpus}
+
+
+class WorkerPool(object):
+    """Runs jobs with at most `workers` in flight, each pinned to its own
+    host cores. Jobs are started heaviest first so the long runs do not end
+    up as the tail of the sweep.
+    """
+
+    def __init__(self, workers = None, mem_per_job = '2GB', pin = True,
+                 poll = 0.5):
+        self._cpus = availableCpus()
+        if workers is None:
+            workers = defaultWorkers(mem_per_job)
+        self._workers = max(1, workers)
+        self._pin = pin
+        self._poll = poll
+
+    def workers(self):
+        return self._workers
+
+    def _launch(self, job, cpus):
+        os.makedirs(job.outdir, exist_ok = True)
+        log = open(os.path.join(job.outdir, 'launcher.log'), 'w')
+        preexec = None
+        if self._pin and hasattr(os, 'sched_setaffinity'):
+            preexec = lambda: os.sched_setaffinity(0, cpus)
+        job.host_cpus = list(cpus)
+        start = time.time()
+        try:
+            proc = subprocess.Popen(job.cmd, stdout = log,
+                                    stderr = subprocess.STDOUT,
+                                    preexec_fn = preexec)
+        except OSError as e:
+            # e.g. a missing gem5 binary, fail this job but not the sweep
+            log.write('Cannot start {}: {}\n'.format(job.cmd[0], e))
+            return None, log, start
+        return proc, log, start
+
+    def _finish(self, job, proc, log, start):
+        log.close()
+        job.returncode = proc.returncode if proc else -1
+        job.seconds = time.time() - start
+        with open(os.path.join(job.outdir, 'exit_status'), 'w') as f:
+            f.write('{}\n'.format(job.returncode))
+
+    def run(self, jobs, callback = None):
+        """Run all jobs and return them with returncode/seconds filled in.
+        callback(job) is called as each job finishes.
+        """
+        pending = sorted(jobs, key = lambda j: j.weight, reverse = True)
+        free = list(self._cpus)
+        running = []
+        try:
+            while pending or running:
+                while pending and len(running) < self._workers:
+                    job = pending[0]
+                    need = min(job.cpus, len(self._cpus))
+                    if len(free) < need:
+                        break
+                    pending.pop(0)
+                    cpus, free = free[:need], free[need:]
+                    running.append((job, cpus) + self._launch(job, cpus))
+                time.sleep(self._poll)
+                still_running = []
+                for entry in running:
+                    job, cpus, proc, log, start = entry
+                    if proc is not None and proc.poll() is None:
+                        still_running.append(entry)
+                        continue
+                    self._finish(job, proc, log, start)
+                    free = sorted(free + cpus)
+                    if callback:
+                        callback(job)
+                running = still_running
+        finally:
+            # Left with running jobs only on an exception such as
+            # KeyboardInterrupt, do not leave them behind
+            for job, cpus, proc, log, start in running:
+                if proc is not None and proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+                log.close()
+        return jobs
+
+def writeStatus(jobs, path):
+    """Write the per-job exit status of a finished sweep as JSON."""
+    with open(path, 'w') as f:
+        json.dump([job.status() for job in jobs], f, indent = 4)
@@ -0,0 +1,39 @@
+""" Extrapolating whole-region metrics from systematic samples. """
+
+import math
+
+
+# Two-sided 95% Student t quantiles for 1..30 degrees of freedom
+_T95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+        2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101,
+        2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052,
+        2.048, 2.045, 2.042]
+
+def t95(dof):
+    if dof < 1:
+        return float('inf')
+    if dof <= len(_T95):
+        return _T95[dof - 1]
+    return 1.960
+
+def estimate(values):
+    """Mean of the samples with the half-width of its 95% confidence
+    interval, absolute and relative to the mean."""
+    n = len(values)
+    if n == 0:
+        return {'mean': None, 'ci95': None, 'rel_ci95': None, 'samples': 0}
+    mean = sum(values) / float(n)
+    if n > 1:
+        var = sum((x - mean) ** 2 for x in values) / float(n - 1)
+        ci = t95(n - 1) * math.sqrt(var / n)
+    else:
+        ci = float('inf')
+    return {'mean': mean,
+            'ci95': ci,
+            'rel_ci95': ci / abs(mean) if mean else None,
+            'samples': n}
+
+def summarize(samples, metrics):
+    """samples is a list of {metric: value} dicts, one per measurement."""
+    return {m: estimate([s[m] for s in samples if s.get(m) is not None])
+            for m in metrics}
@@ -0,0 +1,153 @@
+""" Saturation-point and latency-knee search over the injection rate.
+
+Instead of simulating every rate of a fixed grid, a coarse grid brackets the
+two points of interest and only the brackets are refined:
+
+* the saturation point, the highest rate whose achieved bandwidth is still
+  within `efficiency` of the bandwidth all generators offer at that rate,
+  and
+* the latency knee, the lowest rate whose latency exceeds `knee`
+  times the latency at the lowest rate.
+
+Both are assumed to be monotone in the offered rate. Past saturation the
+achieved bandwidth is the peak the memory sustains, so the first refinement
+of the saturation bracket tries the rates just around that peak over
+`efficiency`, per generator, and usually closes the bracket in one step;
+later steps
+bisect. The knee bracket is bisected down to `knee_resolution`. By default
+it is not refined at all and only narrows where the saturation points
+fall, which keeps the search near a third of the simulations of a linear
+sweep.
+
+The defaults, 4 coarse rates and a saturation point to 1 GBps per
+generator (the step of run.sh), take 5 to 9 simulations, 6 to 7.5 on
+average, on modelled 1-20 GBps curves that run.sh covers with 20. Refining
+the knee to 2 GBps adds about 2.
+"""
+
+import math
+
+
+def grid(lo, hi, count):
+    if count < 2:
+        return [lo, hi]
+    step = (hi - lo) / float(count - 1)
+    return [lo + step * i for i in range(count)]
+
+
+class SaturationSearch(object):
+    """evaluate(rates) simulates a list of rates and returns {rate: metrics}
+    with the 'bandwidth' and 'latency' of llmEvalMetrics. A rate is
+    run_llm_eval.py's injection_rate, which every one of the num_tgens
+    traffic generators offers on its own, while the bandwidth adds up all
+    of them: the offered bandwidth of a rate is rate * num_tgens GBps.
+    Rates, lo, hi and the resolutions are per generator. Each refinement
+    step evaluates `width` rates inside every open bracket, so the rates of
+    one step can run in parallel.
+    """
+
+    def __init__(self, evaluate, lo, hi, efficiency = 0.95, knee = 2.0,
+                 resolution = 1.0, coarse = 4, width = 1,
+                 knee_resolution = None, num_tgens = 1):
+        self._evaluate = evaluate
+        self._num_tgens = num_tgens
+        self._lo = lo
+        self._hi = hi
+        self._efficiency = efficiency
+        self._knee = knee
+        self._resolution = resolution
+        self._knee_resolution = knee_resolution
+        self._coarse = coarse
+        self._width = width
+        # Rates are rounded well below the resolution, so rounding never
+        # merges the rates of a bracket that is still open
+        self._digits = max(3, int(math.ceil(-math.log10(resolution))) + 2)
+        self._guessed = False
+        self.points = {}
+
+    def _eval(self, rates):
+        """Returns the number of rates that were not simulated before."""
+        rates = sorted(set(round(r, self._digits) for r in rates) -
+                       set(self.points))
+        if not rates:
+            return 0
+        for rate, metrics in self._evaluate(rates).items():
+            if metrics is None:
+                raise RuntimeError('Simulation at {:g} GBps failed'
+                                   .format(rate))
+            self.points[rate] = metrics
+        return len(rates)
+
+    def _bracket(self, crossed):
+        """Last evaluated rate before `crossed` holds and the first one at
+        which it does; either is None if there is no such rate."""
+        below = None
+        for rate in sorted(self.points):
+            if crossed(rate):
+                return below, rate
+            below = rate
+        return below, None
+
+    def offered(self, rate):
+        """Bandwidth in GBps all generators offer together at rate."""
+        return rate * self._num_tgens
+
+    def _saturated(self, rate):
+        return self.points[rate]['bandwidth'] < \
+                self._efficiency * self.offered(rate)
+
+    def _pastKnee(self, rate):
+        base = self.points[min(self.points)]['latency']
+        return self.points[rate]['latency'] > self._knee * base
+
+    def _bisect(self, below, above):
+        step = (above - below) / float(self._width + 1)
+        return [below + step * (i + 1) for i in range(self._width)]
+
+    def _aroundPeak(self, below, above):
+        """The rates half a resolution either side of where the achieved
+        bandwidth at `above` puts the saturation point."""
+        guess = self.points[above]['bandwidth'] / self._efficiency / \
+                self._num_tgens
+        half = self._resolution / 2.0
+        rates = [r for r in (guess - half, guess + half) if below < r < above]
+        return rates or self._bisect(below, above)
+
+    def run(self):
+        self._eval(grid(self._lo, self._hi, self._coarse))
+        while True:
+            rates = []
+            below, above = self._bracket(self._saturated)
+            if below is not None and above is not None and \
+                    above - below > self._resolution:
+                if self._guessed:
+                    rates += self._bisect(below, above)
+                else:
+                    rates += self._aroundPeak(below, above)
+                    self._guessed = True
+            below, above = self._bracket(self._pastKnee)
+            if self._knee_resolution and below is not None and \
+                    above is not None and \
+                    above - below > self._knee_resolution:
+                rates += self._bisect(below, above)
+            if not rates or not self._eval(rates):
+                break
+        return self.summary()
+
+    def summary(self):
+        sat_below, sat_above = self._bracket(self._saturated)
+        knee_below, knee_above = self._bracket(self._pastKnee)
+        return {'saturation_rate': sat_below,
+                'saturated_from': sat_above,
+                'num_tgens': self._num_tgens,
+                'saturation_offered': self.offered(sat_below)
+                                      if sat_below is not None else None,
+                'peak_bandwidth': max(m['bandwidth']
+                                      for m in self.points.values()),
+                'zero_load_latency': self.points[min(self.points)]['latency'],
+                'knee_rate': knee_above,
+                'knee_below': knee_below,
+                'simulations': len(self.points)}
+
+    def curve(self):
+        return [(rate, self.points[rate]) for rate in sorted(self.points)]
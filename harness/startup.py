@@ -0,0 +1,79 @@
+""" Host time spent before the first simulated tick.
+
+The config scripts mark the end of each startup phase and write the
+durations to startup.json in their outdir. With profile() the startup also
+runs under cProfile: startup.json then breaks the phases down into the
+work gem5 does for them (binding ports in Python, writing config.ini and
+config.json, creating and connecting the C++ objects) and lists the
+functions that took the most time. Profiling slows the startup down, so
+compare profiled runs only with each other.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import time
+
+
+# breakdown entry -> (file, function) whose cumulative time it counts
+_BREAKDOWN = {
+    'bind_ports': ('params.py', 'connect'),
+    'config_ini': ('SimObject.py', 'print_ini'),
+    'config_json': ('SimObject.py', 'get_config_as_dict'),
+    'cxx_create': ('SimObject.py', 'createCCObject'),
+    'cxx_connect': ('SimObject.py', 'connectPorts'),
+}
+
+class StartupTimer(object):
+
+    def __init__(self):
+        self._start = time.time()
+        self._last = self._start
+        self._profile = None
+        self.phases = {}
+
+    def profile(self):
+        """Profile everything from now until write()."""
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def mark(self, phase):
+        """End `phase` now; it lasted since the previous mark."""
+        now = time.time()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def _report(self, top):
+        self._profile.disable()
+        stats = pstats.Stats(self._profile)
+        breakdown = dict.fromkeys(_BREAKDOWN, 0.0)
+        offenders = []
+        for (path, line, func), entry in stats.stats.items():
+            calls, _, tottime, cumtime = entry[:4]
+            for name, (suffix, function) in _BREAKDOWN.items():
+                if func == function and path.endswith(suffix):
+                    breakdown[name] += cumtime
+            offenders.append({'function': '{}:{}({})'.format(
+                                  os.path.basename(path), line, func),
+                              'calls': calls,
+                              'seconds': tottime,
+                              'cumulative_seconds': cumtime})
+        offenders.sort(key = lambda o: o['seconds'], reverse = True)
+        return breakdown, offenders[:top]
+
+    def write(self, path, top = 20):
+        result = {'phases': self.phases,
+                  'total_seconds': self._last - self._start}
+        if self._profile:
+            result['breakdown'], result['top'] = self._report(top)
+            self._profile = None
+            print('Startup phases: {}'.format(', '.join(
+                  '{} {:.2f}s'.format(k, v)
+                  for k, v in sorted(result['breakdown'].items()))))
+            for offender in result['top'][:10]:
+                print('{:>10.3f}s {:>9} calls  {}'.format(
+                      offender['seconds'], offender['calls'],
+                      offender['function']))
+        with open(path, 'w') as f:
+            json.dump(result, f, indent = 4)
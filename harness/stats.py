@@ -0,0 +1,169 @@
+""" Reading gem5 stats.txt files.
+
+A stats.txt holds one section per m5.stats.dump(). parseStats returns them
+in order as {stat name: value} dicts, keeping only the first value of each
+line (the total for scalars, the value for vector elements).
+"""
+
+import json
+import os
+import re
+
+
+_BEGIN = '---------- Begin Simulation Statistics ----------'
+_END = '---------- End Simulation Statistics'
+
+def _value(token):
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+def parseStats(path, offset = 0):
+    """Sections of stats.txt, starting at byte offset."""
+    sections = []
+    current = None
+    with open(path) as f:
+        f.seek(offset)
+        for line in f:
+            if line.startswith(_BEGIN):
+                current = {}
+                continue
+            if line.startswith(_END):
+                if current is not None:
+                    sections.append(current)
+                current = None
+                continue
+            if current is None:
+                continue
+            fields = line.split()
+            if len(fields) < 2:
+                continue
+            value = _value(fields[1])
+            if value is not None:
+                current[fields[0]] = value
+    return sections
+
+def lastSection(path):
+    sections = parseStats(path)
+    return sections[-1] if sections else {}
+
+class StatsTail(object):
+    """Returns the sections appended to a stats.txt since the last read,
+    so a run that dumps periodically does not re-parse earlier dumps."""
+
+    def __init__(self, path):
+        self._path = path
+        self._offset = 0
+
+    def read(self):
+        if not os.path.isfile(self._path):
+            return []
+        size = os.path.getsize(self._path)
+        sections = parseStats(self._path, self._offset)
+        self._offset = size
+        return sections
+
+def statDelta(new, old):
+    """Difference of two cumulative dumps. Only meaningful for counters."""
+    return {k: v - old.get(k, 0.0) for k, v in new.items()}
+
+def statSum(stats, pattern):
+    """Sum of every stat whose full name matches the regex pattern."""
+    regex = re.compile(pattern)
+    return sum(v for k, v in stats.items() if regex.match(k))
+
+def simSeconds(stats):
+    # Renamed from sim_seconds in newer gem5 versions
+    return stats.get('simSeconds', stats.get('sim_seconds', 0.0))
+
+def hostSeconds(stats):
+    return stats.get('hostSeconds', stats.get('host_seconds', 0.0))
+
+def hostMetrics(stats):
+    """Host cost of the section, under the old stat names."""
+    return {'host_seconds': hostSeconds(stats),
+            'host_tick_rate': stats.get('hostTickRate',
+                                        stats.get('host_tick_rate', 0.0)),
+            'host_mem_usage': stats.get('hostMemory',
+                                        stats.get('host_mem_usage', 0.0))}
+
+_TGEN = r'^system\.tgens\d*\.'
+
+def tgenBytes(stats):
+    return statSum(stats, _TGEN + r'bytes(Read|Written)$')
+
+def tgenBandwidth(stats):
+    """Bandwidth moved by all traffic generators in GiBps, the unit of the
+    injection_rate argument of run_llm_eval.py."""
+    seconds = simSeconds(stats)
+    if not seconds:
+        return 0.0
+    return tgenBytes(stats) / seconds / 2 ** 30
+
+def tgenLatency(stats):
+    """Average read and write latency seen by the traffic generators, ns."""
+    accesses = statSum(stats, _TGEN + r'total(Reads|Writes)$')
+    if not accesses:
+        return 0.0
+    ticks = statSum(stats, _TGEN + r'total(Read|Write)Latency$')
+    return ticks / accesses / 1000.0
+
+def tgenReadLatency(stats):
+    """Average read latency seen by the traffic generators, ns."""
+    reads = statSum(stats, _TGEN + r'totalReads$')
+    if not reads:
+        return 0.0
+    return statSum(stats, _TGEN + r'totalReadLatency$') / reads / 1000.0
+
+_MEM_CTRL = r'^system\.mem_cn?trls\d*\.'
+
+def ctrlQueueLatency(stats):
+    """Average time (ns) the reads of the section waited in the queues of
+    the memory controllers: totQLat over the read bursts."""
+    bursts = statSum(stats, _MEM_CTRL + r'dram\.readBursts$')
+    if not bursts:
+        return 0.0
+    return statSum(stats, _MEM_CTRL + r'dram\.totQLat$') / bursts / 1000.0
+
+def memCtrlMetrics(stats):
+    """Bandwidth (GiBps) served by the memory controllers and their average
+    read access and queueing latency (ns), for full-system runs."""
+    seconds = simSeconds(stats)
+    moved = statSum(stats, _MEM_CTRL + r'bytes(ReadSys|WrittenSys)$')
+    bursts = statSum(stats, _MEM_CTRL + r'dram\.readBursts$')
+    acc_lat = statSum(stats, _MEM_CTRL + r'dram\.totMemAccLat$')
+    return {'bandwidth': moved / seconds / 2 ** 30 if seconds else 0.0,
+            'latency': acc_lat / bursts / 1000.0 if bursts else 0.0,
+            'queue_latency': ctrlQueueLatency(stats),
+            'sim_seconds': seconds}
+
+def llmEvalMetrics(stats):
+    return {'bandwidth': tgenBandwidth(stats),
+            'latency': tgenLatency(stats),
+            'queue_latency': ctrlQueueLatency(stats),
+            'sim_seconds': simSeconds(stats)}
+
+# Runs that dump stats several times (phases, jobs, trials) label their
+# sections in sections.json next to stats.txt: the i-th entry describes the
+# i-th dump.
+
+class SectionLog(object):
+
+    def __init__(self, path):
+        self._path = path
+        self._sections = []
+
+    def add(self, label, begin_tick, end_tick, **info):
+        section = dict(info, label = label, begin_tick = begin_tick,
+                       end_tick = end_tick)
+        self._sections.append(section)
+        with open(self._path, 'w') as f:
+            json.dump(self._sections, f, indent = 4)
+
+def loadSections(outdir):
+    """[(section info, stats)] of a run that wrote sections.json."""
+    with open(os.path.join(outdir, 'sections.json')) as f:
+        sections = json.load(f)
+    stats = parseStats(os.path.join(outdir, 'stats.txt'))
+    return list(zip(sections, stats))
@@ -0,0 +1,33 @@
+""" Steady-state detection over consecutive measurement windows. """
+
+
+class SteadyStateDetector(object):
+    """A run is in steady state once each metric stayed within +-tolerance
+    (relative) of its mean over the last `windows` windows.
+    """
+
+    def __init__(self, metrics = ('bandwidth', 'latency'), tolerance = 0.02,
+                 windows = 3):
+        self._metrics = metrics
+        self._tolerance = tolerance
+        self._windows = windows
+        self.history = []
+
+    def add(self, values):
+        """Record one window and return True if the run has converged."""
+        self.history.append(values)
+        return self.converged()
+
+    def _stable(self, samples):
+        mean = sum(samples) / float(len(samples))
+        if mean == 0:
+            return max(samples) == min(samples)
+        return all(abs(x - mean) <= self._tolerance * abs(mean)
+                   for x in samples)
+
+    def converged(self):
+        if len(self.history) < self._windows:
+            return False
+        recent = self.history[-self._windows:]
+        return all(self._stable([w[m] for w in recent])
+                   for m in self._metrics)
@@ -0,0 +1,162 @@
+""" Reading the periodic ROI stats of run_gapbs.py --stats-interval.
+
+Every row of the time series is a cumulative dump since the start of its
+ROI; timeseries.json labels the rows like sections.json does for stats.txt.
+intervals() turns them into per-interval bandwidth, the queueing latency
+of the memory controllers (ctrl_queue_latency, dram.totQLat over the read
+bursts) and per-channel utilization. The MemScheduler's queueing latency
+(sched_queue_latency) is only reported when its latency and request count
+stats are named with --sched-stats, and it is an error if they are not in
+the series. Channels are those of channels.json, see harness.balance. The HDF5 series needs h5py, the text
+fallback written by gem5 builds without HDF5 does not.
+Usage:
+    python3 -m harness.timeseries (outdir) --csv series.csv
+    python3 -m harness.timeseries (outdir) --sched-stats (latency) (count)
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+
+from harness.balance import loadChannels
+from harness.stats import parseStats, simSeconds, statSum
+
+
+def _loadHdf5(path):
+    try:
+        import h5py
+    except ImportError:
+        raise RuntimeError('Reading {} needs h5py'.format(path))
+    rows = []
+    def visit(name, obj):
+        if not isinstance(obj, h5py.Dataset):
+            return
+        stat = name.replace('/', '.')
+        for i, value in enumerate(obj[()]):
+            while len(rows) <= i:
+                rows.append({})
+            # Vectors are stored per element, keep their total
+            rows[i][stat] = float(value.sum()) if getattr(value, 'ndim', 0) \
+                            else float(value)
+    with h5py.File(path, 'r') as f:
+        f.visititems(visit)
+    return rows
+
+def loadSeries(outdir):
+    """[(row info, cumulative stats)] of a run with --stats-interval."""
+    with open(os.path.join(outdir, 'timeseries.json')) as f:
+        marks = json.load(f)
+    h5 = os.path.join(outdir, 'timeseries.h5')
+    if os.path.isfile(h5):
+        rows = _loadHdf5(h5)
+    else:
+        rows = parseStats(os.path.join(outdir, 'timeseries.txt'))
+    return list(zip(marks, rows))
+
+_MEM_CTRL = r'^system\.mem_cn?trls(\d*)\.'
+_MEM_SCHED = r'^system\.mem_scheds(\d*)\.'
+
+def _delta(row, prev, pattern):
+    return statSum(row, pattern) - statSum(prev, pattern)
+
+def _ratio(row, prev, num, den):
+    count = _delta(row, prev, den)
+    return _delta(row, prev, num) / count if count else 0.0
+
+def _ctrlQueueLatency(row, prev):
+    """Average time in ns the read bursts of the interval queued in the
+    memory controllers."""
+    return _ratio(row, prev, _MEM_CTRL + r'dram\.totQLat$',
+                  _MEM_CTRL + r'dram\.readBursts$') / 1000.0
+
+def _schedPatterns(series, sched_stats):
+    """Regexes of the MemScheduler latency (ticks) and request count
+    stats, checked against the first row."""
+    patterns = [_MEM_SCHED + re.escape(name) + '$' for name in sched_stats]
+    if series:
+        row = series[0][1]
+        for name, pattern in zip(sched_stats, patterns):
+            if not any(re.match(pattern, k) for k in row):
+                raise RuntimeError('No MemScheduler stat {} in the time '
+                                   'series'.format(name))
+    return patterns
+
+def _channelUtil(row, prev, seconds, prev_seconds, channels):
+    """busUtil is a percentage of the time since the stats reset, weight it
+    by that time to get the utilization of the last interval alone."""
+    busy = {}
+    for ctrl, chnl in channels.items():
+        name = ctrl + '.dram.busUtil'
+        if name not in row:
+            continue
+        used = row[name] * seconds - prev.get(name, 0.0) * prev_seconds
+        busy.setdefault(chnl, []).append(used)
+    dt = seconds - prev_seconds
+    return {c: sum(v) / len(v) / dt if dt else 0.0 for c, v in busy.items()}
+
+def intervals(series, channels, ratios = (), sched_stats = None):
+    """Per-interval metrics of loadSeries() rows. channels is the
+    {controller path: channel} of channels.json. ratios are extra
+    (name, numerator regex, denominator regex) columns computed from the
+    deltas of counters. sched_stats names the MemScheduler's (latency,
+    request count) stats for sched_queue_latency."""
+    sched = _schedPatterns(series, sched_stats) if sched_stats else None
+    result = []
+    prev, prev_begin = {}, None
+    for mark, row in series:
+        if mark['begin_tick'] != prev_begin:
+            # A new ROI, its stats start from the reset at begin_tick
+            prev, prev_begin = {}, mark['begin_tick']
+        seconds, prev_seconds = simSeconds(row), simSeconds(prev)
+        dt = seconds - prev_seconds
+        moved = _delta(row, prev, _MEM_CTRL + r'bytes(ReadSys|WrittenSys)$')
+        point = {'label': mark['label'],
+                 'tick': mark['end_tick'],
+                 'bandwidth': moved / dt / 2 ** 30 if dt else 0.0,
+                 'ctrl_queue_latency': _ctrlQueueLatency(row, prev)}
+        if sched:
+            point['sched_queue_latency'] = \
+                    _ratio(row, prev, sched[0], sched[1]) / 1000.0
+        util = _channelUtil(row, prev, seconds, prev_seconds, channels)
+        for channel in sorted(util):
+            point['channel{}_util'.format(channel)] = util[channel]
+        for name, num, den in ratios:
+            point[name] = _ratio(row, prev, num, den)
+        result.append(point)
+        prev = row
+    return result
+
+def writeCsv(path, points):
+    columns = []
+    for point in points:
+        columns += [c for c in point if c not in columns]
+    with open(path, 'w') as f:
+        writer = csv.DictWriter(f, fieldnames = columns)
+        writer.writeheader()
+        writer.writerows(points)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description =
+                        'Per-interval metrics of a run_gapbs.py time series')
+    parser.add_argument('outdir', type = str)
+    parser.add_argument('--channels', type = str, default = None,
+                        help = 'channels.json to use instead of the one in '
+                        'outdir')
+    parser.add_argument('--sched-stats', nargs = 2, default = None,
+                        metavar = ('LATENCY', 'COUNT'),
+                        help = 'MemScheduler stats of the total queueing '
+                        'latency in ticks and of the requests it is summed '
+                        'over, adds sched_queue_latency')
+    parser.add_argument('--ratio', nargs = 3, action = 'append',
+                        default = [], metavar = ('NAME', 'NUM', 'DEN'),
+                        help = 'extra column, delta of the stats matching '
+                        'NUM over the delta of those matching DEN')
+    parser.add_argument('--csv', type = str, default = None)
+    args = parser.parse_args()
+    channels = loadChannels(args.channels or
+                            os.path.join(args.outdir, 'channels.json'))
+    points = intervals(loadSeries(args.outdir), channels, args.ratio,
+                       args.sched_stats)
+    writeCsv(args.csv or os.path.join(args.outdir, 'timeseries.csv'), points)
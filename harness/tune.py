@@ -0,0 +1,144 @@
+""" Search for the smallest MemScheduler and bank buffers that keep the
+bandwidth of one traffic mix.
+
+A buffer configuration is a tuple of sizes, one per searched buffer: all of
+BUFFERS for per-bank memories, only the bank buffers for per-channel ones,
+which have no MemSchedulers (see tunedBuffers).
+Starting from generous sizes, every step halves each buffer on its own and
+moves to the candidate with the fewest total entries among those that
+
+* sustain at least (1 - tolerance) of the bandwidth of the starting
+  configuration, and
+* stay under the latency cap, if there is one.
+
+The search stops when no halving qualifies. Every simulated configuration
+is kept, and paretoSet returns those under the latency cap that no other
+one beats: no other configuration has every buffer at most as large and at
+least the same bandwidth.
+"""
+
+
+# run_llm_eval.py options, in the order of the sizes in a configuration
+BUFFERS = ('sched_read_buffer', 'sched_write_buffer', 'sched_resp_buffer',
+           'bank_read_buffer', 'bank_write_buffer')
+BANK_BUFFERS = BUFFERS[3:]
+
+# mem_type values of the per-bank backends of memsys.backends, the only
+# ones with MemSchedulers
+PER_BANK_MEM_TYPES = ('LLM', 'LLM_SA')
+
+def tunedBuffers(mem_type):
+    if mem_type in PER_BANK_MEM_TYPES:
+        return BUFFERS
+    return BANK_BUFFERS
+
+def bufferArgs(config, buffers = BUFFERS):
+    args = []
+    for name, size in zip(buffers, config):
+        args += ['--' + name.replace('_', '-'), str(size)]
+    return args
+
+def configLabel(config, buffers = BUFFERS):
+    """e.g. SCHED_8_64_128_BANK_8_32"""
+    sizes = dict(zip(buffers, config))
+    parts = []
+    for prefix in ('sched', 'bank'):
+        names = [b for b in buffers if b.startswith(prefix + '_')]
+        if names:
+            parts.append('_'.join([prefix.upper()] +
+                                  [str(sizes[b]) for b in names]))
+    return '_'.join(parts)
+
+def configDict(config, buffers = BUFFERS):
+    return dict(zip(buffers, config))
+
+def _covers(a, b):
+    """a is at most as large as b in every buffer."""
+    return all(x <= y for x, y in zip(a, b))
+
+def paretoSet(points):
+    """Configurations of {config: metrics} no other one beats."""
+    result = []
+    for config, metrics in points.items():
+        beaten = any(other != config and _covers(other, config) and
+                     m['bandwidth'] >= metrics['bandwidth']
+                     for other, m in points.items())
+        if not beaten:
+            result.append(config)
+    return sorted(result, key = lambda c: (sum(c), c))
+
+
+class BufferSearch(object):
+    """evaluate(configs) simulates a list of configurations and returns
+    {config: metrics} with the 'bandwidth' (GBps) and 'latency' (ns) of
+    llmEvalMetrics. The candidates of one step can run in parallel.
+    buffers names the sizes of a configuration.
+    """
+
+    def __init__(self, evaluate, start, minimum = None, latency_cap = None,
+                 tolerance = 0.02, buffers = BUFFERS):
+        self._evaluate = evaluate
+        self._buffers = tuple(buffers)
+        self._start = tuple(start)
+        self._minimum = tuple(minimum or [1] * len(self._buffers))
+        self._latency_cap = latency_cap
+        self._tolerance = tolerance
+        self.points = {}
+        self.path = []
+
+    def _eval(self, configs):
+        configs = [c for c in configs if c not in self.points]
+        if not configs:
+            return
+        for config, metrics in self._evaluate(configs).items():
+            if metrics is None:
+                raise RuntimeError('Simulation of {} failed'.format(
+                                   configLabel(config, self._buffers)))
+            self.points[config] = metrics
+
+    def _underCap(self, config):
+        return self._latency_cap is None or \
+                self.points[config]['latency'] <= self._latency_cap
+
+    def _keeps(self, config):
+        reference = self.points[self._start]['bandwidth']
+        return self.points[config]['bandwidth'] >= \
+                (1 - self._tolerance) * reference and self._underCap(config)
+
+    def _halvings(self, config):
+        candidates = []
+        for i, size in enumerate(config):
+            if size // 2 >= self._minimum[i]:
+                candidates.append(config[:i] + (size // 2,) + config[i + 1:])
+        return candidates
+
+    def run(self):
+        self._eval([self._start])
+        current = self._start
+        self.path.append(current)
+        while True:
+            candidates = self._halvings(current)
+            self._eval(candidates)
+            kept = [c for c in candidates if self._keeps(c)]
+            if not kept:
+                break
+            current = min(kept, key = lambda c:
+                          (sum(c), -self.points[c]['bandwidth']))
+            self.path.append(current)
+        return self.summary()
+
+    def summary(self):
+        def entry(config):
+            return dict(configDict(config, self._buffers),
+                        label = configLabel(config, self._buffers),
+                        **self.points[config])
+        capped = {c: m for c, m in self.points.items() if self._underCap(c)}
+        return {'start': entry(self._start),
+                'start_under_cap': self._underCap(self._start),
+                'smallest': entry(self.path[-1]),
+                'buffers': list(self._buffers),
+                'path': [configLabel(c, self._buffers) for c in self.path],
+                'pareto': [entry(c) for c in paretoSet(capped)],
+                'latency_cap': self._latency_cap,
+                'tolerance': self._tolerance,
+                'simulations': len(self.points)}
@@ -0,0 +1,83 @@
+""" Write-drain threshold of the MemScheduler for a traffic mix.
+
+The MemScheduler starts serving writes once they make up
+service_write_threshold percent of its queue (run_llm_eval.py's wr_perc).
+The threshold is a parameter of the C++ object and cannot change while gem5
+runs, so wr_perc mix is a static per-mix heuristic: it picks one threshold
+per run from the rd_perc argument, before the run starts, and does not
+react to the read latency or write-queue occupancy the scheduler actually
+sees. Runs with several rd_perc values (--points, --phases) need a fixed
+wr_perc. By rule, a read-heavy mix holds
+writes back longer and a write-heavy mix drains them early:
+threshold = rd_perc, clamped to [10, 90].
+
+A table calibrated by `run_tune.py write-drain` replaces the rule. For every
+rd_perc it holds the fixed threshold with the lowest read latency among
+those within tolerance of the best bandwidth. Other rd_perc values are
+interpolated.
+"""
+
+import json
+
+
+RULE_MIN = 10
+RULE_MAX = 90
+
+def ruleThreshold(rd_perc):
+    return int(min(RULE_MAX, max(RULE_MIN, rd_perc)))
+
+def loadTable(path):
+    """{rd_perc: threshold} written by writeTable."""
+    with open(path) as f:
+        return {int(k): v for k, v in json.load(f).items()}
+
+def writeTable(path, table):
+    with open(path, 'w') as f:
+        json.dump({str(k): v for k, v in sorted(table.items())}, f,
+                  indent = 4)
+
+def mixThreshold(rd_perc, table = None):
+    if not table:
+        return ruleThreshold(rd_perc)
+    points = sorted(table.items())
+    if rd_perc <= points[0][0]:
+        return points[0][1]
+    for (lo, lo_thr), (hi, hi_thr) in zip(points, points[1:]):
+        if rd_perc <= hi:
+            frac = (rd_perc - lo) / float(hi - lo)
+            return int(round(lo_thr + frac * (hi_thr - lo_thr)))
+    return points[-1][1]
+
+def bestThreshold(results, tolerance = 0.02):
+    """Threshold of {threshold: metrics} with the lowest read latency among
+    those within tolerance of the highest bandwidth."""
+    top = max(m['bandwidth'] for m in results.values())
+    close = [t for t, m in results.items()
+             if m['bandwidth'] >= (1 - tolerance) * top]
+    return min(close, key = lambda t: (results[t]['read_latency'], t))
+
+def _relative(value, base):
+    return value / base - 1 if base else 0.0
+
+def compare(fixed, mix, tolerance = 0.02):
+    """
+    fixed is {rd_perc: {threshold: metrics}}, mix {rd_perc: metrics} of
+    the wr_perc mix runs. Returns, per rd_perc, the best fixed threshold and
+    how the mix run's bandwidth and read latency compare to it.
+    """
+    result = {}
+    for rd_perc in sorted(fixed):
+        best = bestThreshold(fixed[rd_perc], tolerance)
+        entry = {'best_fixed': best,
+                 'best_fixed_metrics': fixed[rd_perc][best],
+                 'fixed': {str(t): m
+                           for t, m in sorted(fixed[rd_perc].items())}}
+        if mix.get(rd_perc):
+            entry['mix'] = mix[rd_perc]
+            entry['mix_bandwidth_delta'] = _relative(
+                mix[rd_perc]['bandwidth'], fixed[rd_perc][best]['bandwidth'])
+            entry['mix_read_latency_delta'] = _relative(
+                mix[rd_perc]['read_latency'],
+                fixed[rd_perc][best]['read_latency'])
+        result[str(rd_perc)] = entry
+    return result
@@ -0,0 +1,6 @@
+""" Memory-system building blocks shared by the test bench
+(configs-test-llm) and the full-system configs (configs-llm-fs).
+
+Unlike harness, these modules import m5 and only run inside gem5. The
+config scripts make them importable with addToPath('..').
+"""
@@ -0,0 +1,208 @@
+""" Memory technologies shared by the test bench and the full-system configs.
+
+A backend names a DRAM interface, its buffer, page-policy and controller
+settings, and its layout: one MemCtrl per bank behind a MemScheduler per
+channel (the LLM technologies), or one MemCtrl per channel (HBM, DDR4).
+run_llm_eval.py and both run_gapbs.py build their data memory from here, so
+one name is the same model everywhere.
+"""
+
+import m5
+import m5.objects
+
+import json
+
+from memsys.interleave import interleaveRanges
+
+
+class MemBackend(object):
+    """
+    interface is the name of the DRAMInterface class. It is looked up when
+    the memory is built, so a gem5 binary only needs the classes of the
+    backends it actually builds. interface_params and ctrl_params are set
+    on every interface and MemCtrl, sched_params on the MemSchedulers of
+    per-bank backends.
+    """
+
+    def __init__(self, interface, per_bank = False, interface_params = None,
+                 ctrl_params = None, sched_params = None):
+        self.interface = interface
+        self.per_bank = per_bank
+        self.interface_params = interface_params or {}
+        self.ctrl_params = ctrl_params or {}
+        self.sched_params = sched_params or {}
+
+    def interfaceClass(self):
+        cls = getattr(m5.objects, self.interface, None)
+        if cls is None:
+            m5.fatal("This gem5 binary has no {} memory".format(
+                     self.interface))
+        return cls
+
+    def numTargets(self, num_chnls, banks_per_chnl):
+        """Number of memory controllers, i.e. of interleaved targets."""
+        return num_chnls * banks_per_chnl if self.per_bank else num_chnls
+
+    def defaultIntlvSize(self, addr_mapping = None):
+        """A cache line, or a whole row when rows are interleaved."""
+        cls = self.interfaceClass()
+        if addr_mapping is None:
+            addr_mapping = self.interface_params.get('addr_mapping',
+                                                     cls.addr_mapping)
+        if addr_mapping == 'RoRaBaChCo':
+            return cls.device_rowbuffer_size.value * \
+                        cls.devices_per_rank.value
+        return 64
+
+    def createCtrls(self, rng, num_chnls, banks_per_chnl = 1,
+                    intlv_size = None, xor_low_bit = 0, ctrl_params = None,
+                    **interface_params):
+        """
+        MemCtrls that split rng between them, see interleaveRanges.
+        interface_params override those of the backend, e.g. page_policy
+        or null, and ctrl_params those of its MemCtrls. Per-bank backends
+        size every bank to its share of rng unless device_size is given.
+        """
+        cls = self.interfaceClass()
+        params = dict(self.interface_params, **interface_params)
+        ctrl_params = dict(self.ctrl_params, **(ctrl_params or {}))
+        if intlv_size is None:
+            intlv_size = self.defaultIntlvSize(params.get('addr_mapping'))
+        num_int = self.numTargets(num_chnls, banks_per_chnl)
+        ranges = interleaveRanges(rng, num_int, intlv_size, xor_low_bit)
+
+        mem_ctrls = []
+        for i in range(num_int):
+            interface = cls(**params)
+            interface.range = ranges[i]
+            if self.per_bank and 'device_size' not in params:
+                # One bank holds all of the capacity of its range
+                interface.device_size = str(ranges[i].size()) + 'B'
+            ctrl = m5.objects.MemCtrl(**ctrl_params)
+            ctrl.dram = interface
+            mem_ctrls.append(ctrl)
+        return mem_ctrls
+
+    def createScheds(self, num_chnls, **sched_params):
+        """One MemScheduler per channel, none for per-channel backends."""
+        if not self.per_bank:
+            return []
+        params = dict(self.sched_params, **sched_params)
+        return [m5.objects.MemScheduler(**params) for i in range(num_chnls)]
+
+
+BANK_MAPPINGS = ('strided', 'contiguous', 'hashed')
+
+def _fold(value, bits):
+    """XOR of the bits-wide chunks of value."""
+    folded = 0
+    while value:
+        folded ^= value & ((1 << bits) - 1)
+        value >>= bits
+    return folded
+
+def channelMap(num_banks, num_chnls, mapping = 'strided'):
+    """
+    Channel of every bank controller. With banks numbered as in
+    interleaveRanges:
+    * strided: bank i goes to channel i % num_chnls, so consecutive
+      interleave units go to consecutive channels,
+    * contiguous: the banks are cut into num_chnls consecutive blocks, so
+      a channel sees runs of banks_per_chnl consecutive units,
+    * hashed: like strided, but every row of num_chnls banks is rotated by
+      a hash of the row number, so strides that are a multiple of the
+      channel count still spread over all channels.
+    Every mapping gives each channel the same number of banks.
+    """
+    if mapping == 'strided':
+        return [i % num_chnls for i in range(num_banks)]
+    if mapping == 'contiguous':
+        bpc = num_banks // num_chnls
+        return [i // bpc for i in range(num_banks)]
+    if mapping == 'hashed':
+        bits = max(1, (num_chnls - 1).bit_length())
+        return [(i + _fold(i // num_chnls, bits)) % num_chnls
+                for i in range(num_banks)]
+    m5.fatal("Bank mapping {} not supported, choose one of {}".format(
+             mapping, ', '.join(BANK_MAPPINGS)))
+
+def connectScheds(scheds, mem_ctrls, mapping = 'strided'):
+    for ctrl, chnl in zip(mem_ctrls,
+                          channelMap(len(mem_ctrls), len(scheds), mapping)):
+        scheds[chnl].mem_side = ctrl.port
+
+def channelGroups(mem_ctrls, scheds, mapping = 'strided'):
+    """
+    [(controllers, port)] of every channel, where port is the one the
+    channel receives requests on: the scheduler's for per-bank backends,
+    the controller's otherwise.
+    """
+    if not scheds:
+        return [([ctrl], ctrl.port) for ctrl in mem_ctrls]
+    chnls = channelMap(len(mem_ctrls), len(scheds), mapping)
+    return [([ctrl for ctrl, c in zip(mem_ctrls, chnls) if c == j],
+             sched.cpu_side)
+            for j, sched in enumerate(scheds)]
+
+def channelPaths(mem_ctrls, scheds, mapping = 'strided'):
+    """
+    {controller path: channel}, written to channels.json for
+    harness.balance. Only valid once the controllers are children of the
+    system.
+    """
+    if not scheds:
+        return {ctrl.path(): i for i, ctrl in enumerate(mem_ctrls)}
+    chnls = channelMap(len(mem_ctrls), len(scheds), mapping)
+    return {ctrl.path(): c for ctrl, c in zip(mem_ctrls, chnls)}
+
+def writeChannelPaths(path, mem_ctrls, scheds, mapping = 'strided'):
+    with open(path, 'w') as f:
+        json.dump(channelPaths(mem_ctrls, scheds, mapping), f, indent = 4,
+                  sort_keys = True)
+
+
+BACKENDS = {}
+
+def registerBackend(name, backend):
+    BACKENDS[name] = backend
+
+def getBackend(name):
+    if name not in BACKENDS:
+        m5.fatal("Memory type {} not supported, choose one of {}".format(
+                 name, ', '.join(sorted(BACKENDS))))
+    return BACKENDS[name]
+
+
+_LLM_INTERFACE = {'addr_mapping': 'RoCoRaBaCh',
+                  'page_policy': 'close',
+                  'read_buffer_size': 2,
+                  'write_buffer_size': 8}
+# The MemCtrls keep gem5's default scheduling policy, the test bench sets
+# its own
+_LLM_CTRL = {'write_high_thresh_perc': 100,
+             'write_low_thresh_perc': 90,
+             'min_writes_per_switch': 1}
+_LLM_SCHED = {'read_buffer_size': 1,
+              'write_buffer_size': 32,
+              'resp_buffer_size': 64,
+              'unified_queue': True,
+              'service_write_threshold': 60}
+
+registerBackend('LLM', MemBackend('LLM2', per_bank = True,
+                                  interface_params = _LLM_INTERFACE,
+                                  ctrl_params = _LLM_CTRL,
+                                  sched_params = _LLM_SCHED))
+# The older LLM model with subarray-level parallelism in every bank
+registerBackend('LLM_SA', MemBackend('LLM', per_bank = True,
+                                     interface_params = dict(_LLM_INTERFACE,
+                                        subarray_per_bank = 8),
+                                     ctrl_params = _LLM_CTRL,
+                                     sched_params = _LLM_SCHED))
+registerBackend('HBM', MemBackend('HBM_1000_4H_1x128'))
+registerBackend('HBM_1x64', MemBackend('HBM_1000_4H_1x64'))
+registerBackend('HBMSALP', MemBackend('HBM_1000_4H_1x64',
+                                      interface_params = {
+                                        'subarray_per_bank': 8,
+                                        'tWA': '3ns',
+                                        'salp_enable': True}))
+registerBackend('DDR4', MemBackend('DDR4_2400_8x8'))
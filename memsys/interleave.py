@@ -0,0 +1,90 @@
+""" Address interleaving over memory channels and banks. """
+
+import m5
+from m5.objects import AddrRange
+from m5.util import warn
+
+import math
+
+
+def log2(value, what):
+    bits = int(math.log(value, 2))
+    if 2 ** bits != value:
+        m5.fatal("{} must be a power of two, not {}".format(what, value))
+    return bits
+
+def splitCount(num):
+    """num as (regions, bits) with num = regions * 2 ** bits, regions odd."""
+    bits = 0
+    while num % 2 == 0:
+        num //= 2
+        bits += 1
+    return num, bits
+
+def regions(num):
+    """Number of contiguous regions interleaveRanges uses for num targets."""
+    return splitCount(num)[0]
+
+def regionSize(size, num, intlv_size = 64):
+    """
+    Size of all but the last of the contiguous regions interleaveRanges
+    cuts size bytes into for num targets: an equal share rounded down to a
+    whole interleave stripe. The last region takes the remainder.
+    """
+    num_regions, intlv_bits = splitCount(num)
+    stripe = intlv_size << intlv_bits
+    return size // num_regions // stripe * stripe
+
+def interleaveRanges(rng, num, intlv_size = 64, xor_low_bit = 0):
+    """
+    Split rng over num targets, moving to the next target every intlv_size
+    bytes. With a non-zero xor_low_bit the target-select bits are XORed
+    with as many address bits starting at xor_low_bit, which spreads
+    strided accesses that would otherwise hit the same target.
+
+    An address range can only be interleaved over a power of two targets.
+    Any other count, e.g. 6 channels or 48 banks, is split as
+    regions * 2 ** bits with an odd number of regions: rng is cut into that
+    many contiguous regions and each is interleaved over its own
+    2 ** bits targets. The regions are equal up to a whole interleave
+    stripe, see regionSize, so a size such as 1GB that does not divide
+    evenly gives the targets of the last region slightly more. Every target
+    gets about 1/num of rng, and traffic spread over the whole range
+    reaches all of them, but a sequential sweep only reaches the targets
+    of the region it is in. This is not modulo or hash interleaving over
+    num: an odd count, e.g. 7 channels, is not interleaved at all.
+    """
+    intlv_low_bit = log2(intlv_size, "Interleave granularity")
+    num_regions, intlv_bits = splitCount(num)
+    if num > 1 and intlv_bits == 0:
+        warn("{} targets is odd, each gets one contiguous region of the "
+             "address range and nothing is interleaved".format(num))
+    region_size = regionSize(rng.size(), num, intlv_size)
+    if region_size == 0 or rng.size() % (intlv_size << intlv_bits):
+        m5.fatal("Cannot split {} bytes into {} regions of {} targets "
+                 "interleaved every {} bytes".format(rng.size(), num_regions,
+                 2 ** intlv_bits, intlv_size))
+    xor_high_bit = 0
+    if xor_low_bit and intlv_bits:
+        if xor_low_bit < intlv_low_bit + intlv_bits:
+            m5.fatal("XOR bits {}+ overlap the interleave bits {}-{}".format(
+                     xor_low_bit, intlv_low_bit,
+                     intlv_low_bit + intlv_bits - 1))
+        xor_high_bit = xor_low_bit + intlv_bits - 1
+    ranges = []
+    for region in range(num_regions):
+        start = int(rng.start) + region * region_size
+        size = region_size
+        if region == num_regions - 1:
+            size = rng.size() - region * region_size
+        if intlv_bits == 0:
+            ranges.append(AddrRange(start = start, size = size))
+            continue
+        ranges += [AddrRange(start = start,
+                             size = size,
+                             intlvHighBit = intlv_low_bit + intlv_bits - 1,
+                             xorHighBit = xor_high_bit,
+                             intlvBits = intlv_bits,
+                             intlvMatch = i)
+                   for i in range(2 ** intlv_bits)]
+    return ranges
@@ -0,0 +1,90 @@
+""" Benchmark how fast gem5 simulates the LLM configurations and compare
+against a stored baseline, to catch gem5 changes that slow down sweeps.
+Runs go one at a time so they do not disturb each other's host time.
+Usage:
+    python3 run_bench.py --save-baseline
+    python3 run_bench.py --kernel vmlinux-5.2.3 --disk gapbs --threshold 0.1
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+from harness.bench import *
+from harness.pool import WorkerPool
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description =
+                        'Host-performance benchmarks of the LLM configs')
+    parser.add_argument('--gem5', type = str,
+                        default = 'gem5/build/NULL/gem5.opt')
+    parser.add_argument('--gem5-fs', type = str,
+                        default = 'gem5/build/X86/gem5.opt')
+    parser.add_argument('--kernel', type = str, default = None,
+                        help = 'also benchmark a GAPBS ROI with this kernel')
+    parser.add_argument('--disk', type = str, default = None)
+    parser.add_argument('--checkpoint-dir', type = str,
+                        default = 'checkpoints')
+    parser.add_argument('--results', type = str, default = 'results-bench')
+    parser.add_argument('--baseline', type = str,
+                        default = 'bench_baseline.json')
+    parser.add_argument('--threshold', type = float, default = 0.15,
+                        help = 'relative slowdown that fails a metric')
+    parser.add_argument('--save-baseline', action = 'store_true',
+                        help = 'store these results as the new baseline')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    pool = WorkerPool(workers = 1)
+    jobs = llmBenchJobs(args.gem5, args.results)
+    results = {}
+    if args.kernel and args.disk:
+        checkpoint_dir = os.path.abspath(args.checkpoint_dir)
+        # Every measured FS run, the first included, restores the same
+        # checkpoint
+        prepare = fsCheckpointJob(args.gem5_fs, args.results, args.kernel,
+                                  args.disk, checkpoint_dir)
+        pool.run([prepare])
+        if prepare.returncode != 0:
+            results[prepare.name] = None
+        else:
+            jobs.append(fsBenchJob(args.gem5_fs, args.results, args.kernel,
+                                   args.disk, checkpoint_dir))
+    pool.run(jobs)
+
+    results.update((job.name, benchMetrics(job)) for job in jobs)
+    failed_runs = [name for name, metrics in results.items()
+                   if metrics is None]
+    for name in failed_runs:
+        print('{} failed'.format(name))
+    os.makedirs(args.results, exist_ok = True)
+    with open(os.path.join(args.results, 'bench.json'), 'w') as f:
+        json.dump(results, f, indent = 4, sort_keys = True)
+
+    if args.save_baseline:
+        writeBaseline(args.baseline, {name: metrics for name, metrics
+                                      in results.items() if metrics})
+        print('Stored baseline {}'.format(args.baseline))
+        sys.exit(1 if failed_runs else 0)
+    if not os.path.isfile(args.baseline):
+        print('No baseline {}, run with --save-baseline first'.format(
+              args.baseline))
+        sys.exit(1 if failed_runs else 0)
+
+    baseline = loadBaseline(args.baseline)
+    if baseline['host'] != socket.gethostname():
+        print('Warning: the baseline was taken on {}'.format(
+              baseline['host']))
+    rows = compare(results, baseline, args.threshold)
+    print('{:<22} {:<20} {:>14} {:>14} {:>8}'.format(
+          'run', 'metric', 'value', 'baseline', ''))
+    for run, metric, value, base, ok in rows:
+        print('{:<22} {:<20} {:>14.4g} {:>14.4g} {:>8}'.format(
+              run, metric, value, base, 'ok' if ok else 'FAIL'))
+    regressions = [row for row in rows if not row[4]]
+    print('{} of {} metrics regressed'.format(len(regressions), len(rows)))
+    sys.exit(1 if regressions or failed_runs else 0)
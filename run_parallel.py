@@ -0,0 +1,117 @@
+""" Experiment with the unsafe multi-event-queue mode of run_llm_eval.py
+against the single-queue baseline: host time and the change in bandwidth
+and latency. The mode is not a supported speedup. Crossbars call into
+objects on other queues without locking, so a run can crash or report wrong
+statistics even when it matches the baseline. Use the single-queue results.
+The runs go one at a time so they do not compete for host cores.
+Usage:
+    python3 run_parallel.py LLM_64 --unsafe --queues 2,4,8
+    python3 run_parallel.py LLM_64 --unsafe --queues 4 --sim-quantum 1ns,4ns
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from harness.matrix import LLM_EVAL_CONFIGS, llmEvalJob, parseRange
+from harness.pool import WorkerPool
+from harness.stats import hostSeconds, lastSection, llmEvalMetrics
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description =
+                'Unsafe multi-event-queue test bench experiment')
+    parser.add_argument('config', type = str, nargs = '?', default = None,
+                        help = 'one of {}'.format(
+                            ', '.join(name for name, _ in LLM_EVAL_CONFIGS)))
+    parser.add_argument('--args', type = str, default = None,
+                        help = 'run_llm_eval.py arguments up to num_tgens, '
+                        'instead of a named config')
+    parser.add_argument('--gem5', type = str,
+                        default = 'gem5/build/NULL/gem5.opt')
+    parser.add_argument('--results', type = str,
+                        default = 'results-parallel')
+    parser.add_argument('--queues', type = str, default = '2,4,8',
+                        help = 'event queue counts to compare against 1')
+    parser.add_argument('--sim-quantum', type = str, default = 'auto',
+                        help = 'comma separated quanta to try, e.g. '
+                        'auto,1ns,4ns')
+    parser.add_argument('--traffic', type = str, default = 'LINEAR')
+    parser.add_argument('--bw', type = float, default = 16)
+    parser.add_argument('--rd-perc', type = int, default = 100)
+    parser.add_argument('--duration', type = str, default = '10us')
+    parser.add_argument('--unsafe', action = 'store_true',
+                        help = 'accept that the multi-queue runs race')
+    return parser.parse_args()
+
+def relDelta(value, base):
+    return (value - base) / base if base else 0.0
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    if not args.unsafe:
+        print('Multiple event queues race: crossbars call into objects on '
+              'other queues without locking. Pass --unsafe to run the '
+              'experiment anyway')
+        sys.exit(1)
+    print('Warning: the multi-queue runs are unsafe, their results are not '
+          'valid measurements')
+    if args.args:
+        name, config_args = 'custom', args.args.split()
+    else:
+        configs = dict(LLM_EVAL_CONFIGS)
+        name = args.config or LLM_EVAL_CONFIGS[0][0]
+        config_args = configs[name]
+    outroot = os.path.join(args.results, name)
+
+    runs = [(1, None)] + [(queues, quantum)
+                          for queues in parseRange(args.queues)
+                          for quantum in args.sim_quantum.split(',')]
+    jobs = []
+    for queues, quantum in runs:
+        label = 'EQ_{}'.format(queues)
+        extra = []
+        if quantum:
+            label += '_Q_{}'.format(quantum)
+            extra = ['--event-queues', queues, '--sim-quantum', quantum,
+                     '--unsafe-event-queues']
+        jobs.append(llmEvalJob(args.gem5, os.path.join(outroot, label),
+                               config_args, args.traffic, args.duration,
+                               args.bw, args.rd_perc, extra = extra,
+                               name = label, cpus = queues))
+    # The largest run needs every core it asked for
+    pool = WorkerPool(workers = 1)
+    pool.run(jobs)
+
+    results = []
+    for (queues, quantum), job in zip(runs, jobs):
+        stats_file = os.path.join(job.outdir, 'stats.txt')
+        if job.returncode != 0 or not os.path.isfile(stats_file):
+            print('{} failed, see {}'.format(job.name, job.outdir))
+            continue
+        stats = lastSection(stats_file)
+        results.append(dict(llmEvalMetrics(stats), name = job.name,
+                            queues = queues, sim_quantum = quantum,
+                            host_seconds = hostSeconds(stats)))
+    if not results or results[0]['queues'] != 1:
+        print('The single-queue baseline failed')
+        sys.exit(1)
+
+    base = results[0]
+    print('{:<20} {:>10} {:>8} {:>10} {:>10}'.format(
+          'run', 'host s', 'speedup', 'bw delta', 'lat delta'))
+    for result in results:
+        result['speedup'] = base['host_seconds'] / result['host_seconds'] \
+                            if result['host_seconds'] else 0.0
+        result['bandwidth_delta'] = relDelta(result['bandwidth'],
+                                             base['bandwidth'])
+        result['latency_delta'] = relDelta(result['latency'],
+                                           base['latency'])
+        print('{:<20} {:>10.2f} {:>8.2f} {:>9.2%} {:>9.2%}'.format(
+              result['name'], result['host_seconds'], result['speedup'],
+              result['bandwidth_delta'], result['latency_delta']))
+
+    os.makedirs(outroot, exist_ok = True)
+    with open(os.path.join(outroot, 'parallel.json'), 'w') as f:
+        json.dump(results, f, indent = 4)
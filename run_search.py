@@ -0,0 +1,106 @@
+""" Find the bandwidth saturation point and latency knee of one test-bench
+configuration with a refining search instead of a linear injection-rate
+sweep.
+Usage:
+    python3 run_search.py LLM_32 --traffic LINEAR --rd-perc 60
+    python3 run_search.py --args 'LLM 4 64 0 60 close 16' --lo 1 --hi 40
+"""
+
+import argparse
+import json
+import os
+
+from harness.llmeval import runPoints
+from harness.matrix import LLM_EVAL_CONFIGS
+from harness.pool import WorkerPool
+from harness.search import SaturationSearch
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description =
+                'Saturation-point search for run_llm_eval.py configurations')
+    parser.add_argument('config', type = str, nargs = '?', default = None,
+                        help = 'one of {}'.format(
+                            ', '.join(name for name, _ in LLM_EVAL_CONFIGS)))
+    parser.add_argument('--args', type = str, default = None,
+                        help = 'run_llm_eval.py arguments up to num_tgens, '
+                        'instead of a named config')
+    parser.add_argument('--gem5', type = str,
+                        default = 'gem5/build/NULL/gem5.opt')
+    parser.add_argument('--results', type = str, default = 'results-search')
+    parser.add_argument('--workers', type = int, default = None)
+    parser.add_argument('--mem-per-job', type = str, default = '2GB')
+    parser.add_argument('--cache-dir', type = str, default = None)
+    parser.add_argument('--traffic', type = str, default = 'LINEAR')
+    parser.add_argument('--rd-perc', type = int, default = 100)
+    parser.add_argument('--duration', type = str, default = '10us')
+    parser.add_argument('--lo', type = float, default = 1,
+                        help = 'lowest injection rate in GBps, per traffic '
+                        'generator')
+    parser.add_argument('--hi', type = float, default = 20,
+                        help = 'highest injection rate in GBps, per traffic '
+                        'generator')
+    parser.add_argument('--coarse', type = int, default = 4,
+                        help = 'points of the initial grid')
+    parser.add_argument('--width', type = int, default = 1,
+                        help = 'points per bracket and refinement step')
+    parser.add_argument('--resolution', type = float, default = 1.0,
+                        help = 'stop when the saturation bracket is this '
+                        'narrow, GBps')
+    parser.add_argument('--knee-resolution', type = float, default = None,
+                        help = 'also refine the knee bracket down to this '
+                        'width in GBps, about 2 more simulations at 2')
+    parser.add_argument('--efficiency', type = float, default = 0.95,
+                        help = 'achieved/offered ratio below which a rate '
+                        'counts as saturated')
+    parser.add_argument('--knee', type = float, default = 2.0,
+                        help = 'latency increase over zero load that marks '
+                        'the knee')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    if args.args:
+        name, config_args = 'custom', args.args.split()
+    else:
+        configs = dict(LLM_EVAL_CONFIGS)
+        name = args.config or LLM_EVAL_CONFIGS[0][0]
+        config_args = configs[name]
+
+    outroot = os.path.join(args.results, name)
+    extra = []
+    if args.cache_dir:
+        extra = ['--cache-dir', os.path.abspath(args.cache_dir)]
+    pool = WorkerPool(workers = args.workers, mem_per_job = args.mem_per_job)
+
+    def evaluate(rates):
+        points = [(args.traffic, rate, args.rd_perc) for rate in rates]
+        results = runPoints(pool, args.gem5, outroot, config_args, points,
+                            duration = args.duration, extra = extra)
+        for rate in rates:
+            metrics = results[(args.traffic, rate, args.rd_perc)]
+            if metrics:
+                print('{:>8g} GBps x {} -> {:8.3f} GBps {:10.2f} ns'.format(
+                      rate, config_args[6], metrics['bandwidth'],
+                      metrics['latency']))
+        return {rate: results[(args.traffic, rate, args.rd_perc)]
+                for rate in rates}
+
+    search = SaturationSearch(evaluate, args.lo, args.hi,
+                              efficiency = args.efficiency, knee = args.knee,
+                              resolution = args.resolution,
+                              coarse = args.coarse, width = args.width,
+                              knee_resolution = args.knee_resolution,
+                              num_tgens = int(config_args[6]))
+    summary = search.run()
+
+    os.makedirs(outroot, exist_ok = True)
+    with open(os.path.join(outroot, 'curve.csv'), 'w') as f:
+        f.write('injection_rate,offered,achieved,latency_ns\n')
+        for rate, metrics in search.curve():
+            f.write('{:g},{:g},{},{}\n'.format(rate, search.offered(rate),
+                                              metrics['bandwidth'],
+                                              metrics['latency']))
+    with open(os.path.join(outroot, 'search.json'), 'w') as f:
+        json.dump(summary, f, indent = 4)
+    print(json.dumps(summary, indent = 4))
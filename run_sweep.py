@@ -0,0 +1,154 @@
+""" Run the test-bench and GAPBS sweeps on a bounded, pinned worker pool.
+
+Replaces the fan-out in run.sh/run-fs.sh which started every point at once.
+Usage:
+    python3 run_sweep.py llm [--workers N] [--bw 1:20] [--rd-perc 0,40,...]
+    python3 run_sweep.py gapbs kernel disk [--apps bfs,cc] [--sizes 20:22]
+"""
+
+import argparse
+import os
+import sys
+
+from harness.matrix import *
+from harness.pool import WorkerPool, writeStatus
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description =
+                                'Run a gem5 sweep on a bounded worker pool')
+    parser.add_argument('--gem5', type = str, default = None,
+                        help = 'gem5 binary, defaults to gem5/build/NULL '
+                        'for llm and gem5/build/X86 for gapbs')
+    parser.add_argument('--results', type = str, default = 'results',
+                        help = 'root of the per-point output directories')
+    parser.add_argument('--workers', type = int, default = None,
+                        help = 'concurrent gem5 processes, defaults to '
+                        'what fits in the cores and memory of this host')
+    parser.add_argument('--mem-per-job', type = str, default = '2GB',
+                        help = 'expected peak memory of one gem5 process')
+    parser.add_argument('--no-pin', action = 'store_true',
+                        help = 'do not pin gem5 processes to host cores')
+    parser.add_argument('--no-config-dump', action = 'store_true',
+                        help = 'do not write config.ini/config.json per run')
+
+    subparsers = parser.add_subparsers(dest = 'sweep')
+    subparsers.required = True
+
+    llm = subparsers.add_parser('llm', help = 'run_llm_eval.py sweep')
+    llm.add_argument('--bw', type = str, default = '1:20',
+                     help = 'injection rates in GBps, e.g. 1:20 or 4,8,16')
+    llm.add_argument('--traffic', type = str, default = 'LINEAR,RANDOM')
+    llm.add_argument('--rd-perc', type = str, default = '0,40,50,60,100')
+    llm.add_argument('--duration', type = str, default = '10us')
+    llm.add_argument('--cache-dir', type = str, default = None,
+                     help = 'reuse results of identical earlier runs '
+                     'stored in this directory')
+    llm.add_argument('--steady-state', action = 'store_true',
+                     help = 'end each point once it reaches steady state, '
+                     'with duration as the upper bound')
+    llm.add_argument('--fork-jobs', type = int, default = None,
+                     help = 'instantiate each config once and fork its '
+                     'points, running this many per config at a time')
+    llm.add_argument('--configs', type = str,
+                     default = ','.join(name for name, _ in LLM_EVAL_CONFIGS),
+                     help = 'subset of {}'.format(
+                        ', '.join(name for name, _ in LLM_EVAL_CONFIGS)))
+
+    gapbs = subparsers.add_parser('gapbs', help = 'run_gapbs.py sweep')
+    gapbs.add_argument('kernel', type = str)
+    gapbs.add_argument('disk', type = str)
+    gapbs.add_argument('--apps', type = str, default = 'bfs,cc')
+    gapbs.add_argument('--sizes', type = str, default = '20:22')
+    gapbs.add_argument('--cpu-type', type = str, default = 'simple')
+    gapbs.add_argument('--num-cpus', type = int, default = 1)
+    gapbs.add_argument('--mem-sys', type = str, default = 'classic')
+    gapbs.add_argument('--channels', type = int, default = 1)
+    gapbs.add_argument('--synthetic', type = int, default = 1)
+    gapbs.add_argument('--ff-cpu', type = str, default = None,
+                       help = 'kvm or atomic, run_gapbs.py picks KVM when '
+                       'the host has /dev/kvm')
+    gapbs.add_argument('--batch', action = 'store_true',
+                       help = 'run every app and size in one boot')
+    gapbs.add_argument('--stats-interval', type = str, default = None,
+                       help = 'periodic ROI stats, e.g. 100us')
+    gapbs.add_argument('--trials', type = int, default = None,
+                       help = 'GAPBS trials per run, the first is warm-up')
+    gapbs.add_argument('--sim-quantum', type = str, default = None,
+                       help = 'event queue quantum of host-parallel KVM')
+    gapbs.add_argument('--checkpoint-dir', type = str, default = None,
+                       help = 'share post-boot checkpoints between runs')
+    gapbs.add_argument('--roi-checkpoint', action = 'store_true',
+                       help = 'also share ROI-entry checkpoints')
+    gapbs.add_argument('--sample', action = 'store_true',
+                       help = 'simulate the ROI in detailed samples and '
+                       'extrapolate, see run_gapbs.py --sample')
+
+    return parser.parse_args()
+
+def buildJobs(args):
+    if args.sweep == 'llm':
+        gem5 = args.gem5 or 'gem5/build/NULL/gem5.opt'
+        names = args.configs.split(',')
+        configs = [c for c in LLM_EVAL_CONFIGS if c[0] in names]
+        extra = []
+        if args.cache_dir:
+            extra = ['--cache-dir', os.path.abspath(args.cache_dir)]
+        if args.no_config_dump:
+            extra.append('--no-config-dump')
+        if args.steady_state:
+            extra.append('--steady-state')
+        if args.fork_jobs:
+            return llmEvalForkJobs(gem5, args.results, parseRange(args.bw),
+                                   args.traffic.split(','),
+                                   parseRange(args.rd_perc), args.fork_jobs,
+                                   configs = configs,
+                                   duration = args.duration, extra = extra)
+        return llmEvalJobs(gem5, args.results, parseRange(args.bw),
+                           args.traffic.split(','),
+                           parseRange(args.rd_perc), configs = configs,
+                           duration = args.duration, extra = extra)
+    gem5 = args.gem5 or 'gem5/build/X86/gem5.opt'
+    extra = []
+    if args.checkpoint_dir:
+        extra = ['--checkpoint-dir', os.path.abspath(args.checkpoint_dir)]
+        if args.roi_checkpoint:
+            extra.append('--roi-checkpoint')
+    if args.sample:
+        extra.append('--sample')
+    if args.ff_cpu:
+        extra += ['--ff-cpu', args.ff_cpu]
+    if args.stats_interval:
+        extra += ['--stats-interval', args.stats_interval]
+    if args.trials:
+        extra += ['--trials', str(args.trials)]
+    if args.sim_quantum:
+        extra += ['--sim-quantum', args.sim_quantum]
+    if args.no_config_dump:
+        extra.append('--no-config-dump')
+    build = gapbsBatchJob if args.batch else gapbsJobs
+    return build(gem5, args.results, args.kernel, args.disk,
+                 args.apps.split(','), parseRange(args.sizes),
+                 cpu_type = args.cpu_type, num_cpus = args.num_cpus,
+                 mem_sys = args.mem_sys, channels = args.channels,
+                 synthetic = args.synthetic, extra = extra)
+
+def report(job):
+    state = 'ok' if job.returncode == 0 else \
+            'FAILED ({})'.format(job.returncode)
+    print('{:<40} {:>8.1f}s  {}'.format(job.name, job.seconds, state))
+    sys.stdout.flush()
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    jobs = buildJobs(args)
+    pool = WorkerPool(workers = args.workers, mem_per_job = args.mem_per_job,
+                      pin = not args.no_pin)
+    print('Running {} jobs on {} workers'.format(len(jobs), pool.workers()))
+    pool.run(jobs, callback = report)
+
+    os.makedirs(args.results, exist_ok = True)
+    writeStatus(jobs, os.path.join(args.results, 'sweep_status.json'))
+    failed = [job for job in jobs if job.returncode != 0]
+    print('{} of {} jobs failed'.format(len(failed), len(jobs)))
+    sys.exit(1 if failed else 0)
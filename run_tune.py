@@ -0,0 +1,212 @@
+""" Tune the memory-system parameters of one test-bench configuration for one
+traffic mix.
+Usage:
+    python3 run_tune.py buffers LLM_64 --traffic RANDOM --rd-perc 60 --latency-cap 200
+    python3 run_tune.py buffers --args 'LLM 4 64 0 60 close 16' --start 4,64,128,8,32
+    python3 run_tune.py write-drain LLM_64 --thresholds 20,40,60,80,100 --table wr_table.json
+"""
+
+import argparse
+import csv
+import json
+import os
+
+from harness.llmeval import runJobs, runVariants
+from harness.matrix import LLM_EVAL_CONFIGS, llmEvalJob, parseRange
+from harness.pool import WorkerPool
+from harness.stats import llmEvalMetrics, tgenReadLatency
+from harness.tune import BUFFERS, BufferSearch, bufferArgs, configLabel, \
+                         tunedBuffers
+from harness.writedrain import mixThreshold, bestThreshold, compare, \
+                               loadTable, writeTable
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description =
+                'Memory-system tuning for run_llm_eval.py configurations')
+    parser.add_argument('--gem5', type = str,
+                        default = 'gem5/build/NULL/gem5.opt')
+    parser.add_argument('--results', type = str, default = 'results-tune')
+    parser.add_argument('--workers', type = int, default = None)
+    parser.add_argument('--mem-per-job', type = str, default = '2GB')
+    parser.add_argument('--cache-dir', type = str, default = None)
+
+    subparsers = parser.add_subparsers(dest = 'tune')
+    subparsers.required = True
+
+    buffers = subparsers.add_parser('buffers', help = 'smallest MemScheduler '
+                                    'and bank buffers that keep the bandwidth')
+    addConfigArguments(buffers)
+    buffers.add_argument('--traffic', type = str, default = 'RANDOM')
+    buffers.add_argument('--rd-perc', type = int, default = 60)
+    buffers.add_argument('--rate', type = float, default = 20,
+                         help = 'offered injection rate in GBps, high '
+                         'enough to saturate the memory')
+    buffers.add_argument('--duration', type = str, default = '10us')
+    buffers.add_argument('--start', type = str, default = '8,64,128,8,32',
+                         help = 'sizes to start from, as {}. Memories '
+                         'without MemSchedulers only use the bank '
+                         'buffers'.format(','.join(BUFFERS)))
+    buffers.add_argument('--min', type = str, default = '1,1,1,1,1',
+                         help = 'smallest size of every buffer')
+    buffers.add_argument('--latency-cap', type = float, default = None,
+                         help = 'highest acceptable average latency in ns')
+    buffers.add_argument('--tolerance', type = float, default = 0.02,
+                         help = 'bandwidth loss against the start '
+                         'configuration that still counts as no loss')
+
+    drain = subparsers.add_parser('write-drain', help = 'wr_perc mix '
+                                  'against fixed MemScheduler write '
+                                  'thresholds')
+    addConfigArguments(drain)
+    drain.add_argument('--traffic', type = str, default = 'RANDOM')
+    drain.add_argument('--rate', type = float, default = 20,
+                       help = 'offered injection rate in GBps')
+    drain.add_argument('--rd-perc', type = str, default = '0,40,50,60,100',
+                       help = 'read percentages, those of run.sh by default')
+    drain.add_argument('--thresholds', type = str, default = '20,40,60,80,100',
+                       help = 'fixed wr_perc values to compare against')
+    drain.add_argument('--duration', type = str, default = '10us')
+    drain.add_argument('--tolerance', type = float, default = 0.02,
+                       help = 'bandwidth loss against the best fixed '
+                       'threshold that still counts as no loss')
+    drain.add_argument('--wr-table', type = str, default = None,
+                       help = 'table the mix runs use instead of the rule')
+    drain.add_argument('--table', type = str, default = None,
+                       help = 'write the best fixed threshold per rd_perc '
+                       'here, for run_llm_eval.py --wr-table')
+    return parser.parse_args()
+
+def addConfigArguments(parser):
+    parser.add_argument('config', type = str, nargs = '?', default = None,
+                        help = 'one of {}'.format(
+                            ', '.join(name for name, _ in LLM_EVAL_CONFIGS)))
+    parser.add_argument('--args', type = str, default = None,
+                        help = 'run_llm_eval.py arguments up to num_tgens, '
+                        'instead of a named config')
+
+def parseSizes(text, buffers = BUFFERS):
+    """Sizes of buffers, given for them or for all of BUFFERS."""
+    sizes = tuple(int(s) for s in text.split(','))
+    if len(sizes) == len(BUFFERS):
+        sizes = sizes[len(BUFFERS) - len(buffers):]
+    if len(sizes) != len(buffers):
+        raise SystemExit('Expected {} sizes: {}'.format(len(buffers),
+                         ','.join(buffers)))
+    return sizes
+
+def configArgs(args):
+    if args.args:
+        return 'custom', args.args.split()
+    configs = dict(LLM_EVAL_CONFIGS)
+    name = args.config or LLM_EVAL_CONFIGS[0][0]
+    return name, configs[name]
+
+def tuneBuffers(args, pool, extra):
+    name, config_args = configArgs(args)
+    outroot = os.path.join(args.results, name, 'buffers')
+    point = (args.traffic, args.rate, args.rd_perc)
+    # Per-channel memories have no MemScheduler buffers to shrink
+    buffers = tunedBuffers(config_args[0])
+    if buffers != BUFFERS:
+        print('{} has no MemSchedulers, searching {} only'.format(
+              config_args[0], ', '.join(buffers)))
+
+    def label(config):
+        return configLabel(config, buffers)
+
+    def evaluate(configs):
+        variants = {label(c): bufferArgs(c, buffers) for c in configs}
+        results = runVariants(pool, args.gem5, outroot, config_args, point,
+                              variants, duration = args.duration,
+                              extra = extra)
+        for config in configs:
+            metrics = results[label(config)]
+            if metrics:
+                print('{:<32} {:8.3f} GBps {:10.2f} ns'.format(
+                      label(config), metrics['bandwidth'],
+                      metrics['latency']))
+        return {c: results[label(c)] for c in configs}
+
+    search = BufferSearch(evaluate, parseSizes(args.start, buffers),
+                          minimum = parseSizes(args.min, buffers),
+                          latency_cap = args.latency_cap,
+                          tolerance = args.tolerance, buffers = buffers)
+    summary = search.run()
+
+    os.makedirs(outroot, exist_ok = True)
+    with open(os.path.join(outroot, 'pareto.csv'), 'w') as f:
+        columns = ['label'] + list(buffers) + ['bandwidth', 'latency']
+        writer = csv.DictWriter(f, fieldnames = columns,
+                                extrasaction = 'ignore')
+        writer.writeheader()
+        writer.writerows(summary['pareto'])
+    with open(os.path.join(outroot, 'tune.json'), 'w') as f:
+        json.dump(summary, f, indent = 4)
+    print(json.dumps(summary['smallest'], indent = 4))
+
+def drainMetrics(stats):
+    return dict(llmEvalMetrics(stats), read_latency = tgenReadLatency(stats))
+
+def tuneWriteDrain(args, pool, extra):
+    name, config_args = configArgs(args)
+    outroot = os.path.join(args.results, name, 'write-drain')
+    rd_percs = parseRange(args.rd_perc)
+    thresholds = parseRange(args.thresholds)
+
+    jobs = {}
+    for rd_perc in rd_percs:
+        for threshold in thresholds + ['mix']:
+            # wr_perc is the fifth run_llm_eval.py argument
+            wr_args = list(config_args)
+            wr_args[4] = str(threshold)
+            wr_extra = list(extra)
+            if threshold == 'mix' and args.wr_table:
+                wr_extra += ['--wr-table', os.path.abspath(args.wr_table)]
+            jobs[(rd_perc, threshold)] = llmEvalJob(args.gem5,
+                    os.path.join(outroot, 'WR_{}'.format(threshold)),
+                    wr_args, args.traffic, args.duration, args.rate, rd_perc,
+                    extra = wr_extra,
+                    name = 'WR_{}/RD_{}'.format(threshold, rd_perc))
+    results = runJobs(pool, jobs, metrics = drainMetrics)
+
+    fixed = {}
+    mix = {}
+    for (rd_perc, threshold), metrics in results.items():
+        if metrics is None:
+            raise SystemExit('WR_{}/RD_{} failed'.format(threshold, rd_perc))
+        if threshold == 'mix':
+            mix[rd_perc] = metrics
+        else:
+            fixed.setdefault(rd_perc, {})[threshold] = metrics
+    table = loadTable(args.wr_table) if args.wr_table else None
+    summary = compare(fixed, mix, args.tolerance)
+    for rd_perc in rd_percs:
+        entry = summary[str(rd_perc)]
+        entry['mix_threshold'] = mixThreshold(rd_perc, table)
+        print('RD_{:<4} best fixed {:>4} {:8.3f} GBps {:9.2f} ns read, '
+              'mix {:>3}: bandwidth {:+.1%} read latency {:+.1%}'.format(
+              rd_perc, entry['best_fixed'],
+              entry['best_fixed_metrics']['bandwidth'],
+              entry['best_fixed_metrics']['read_latency'],
+              entry['mix_threshold'], entry['mix_bandwidth_delta'],
+              entry['mix_read_latency_delta']))
+
+    os.makedirs(outroot, exist_ok = True)
+    with open(os.path.join(outroot, 'write_drain.json'), 'w') as f:
+        json.dump(summary, f, indent = 4)
+    if args.table:
+        writeTable(args.table, {rd_perc: bestThreshold(fixed[rd_perc],
+                                                       args.tolerance)
+                                for rd_perc in rd_percs})
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    extra = []
+    if args.cache_dir:
+        extra = ['--cache-dir', os.path.abspath(args.cache_dir)]
+    pool = WorkerPool(workers = args.workers, mem_per_job = args.mem_per_job)
+    if args.tune == 'buffers':
+        tuneBuffers(args, pool, extra)
+    else:
+        tuneWriteDrain(args, pool, extra)